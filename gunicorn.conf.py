@@ -0,0 +1,43 @@
+"""
+Configuración de gunicorn (web y asgi del Procfile).
+
+Con preload_app el proceso maestro importa Django, el URLconf y compila las
+plantillas una sola vez; los workers lo heredan al hacer fork y solo abren sus
+propias conexiones a la base de datos antes de aceptar peticiones
+(ver lugares/arranque.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# Sin WEB_CONCURRENCY, pocos workers: en contenedores cpu_count() ve los núcleos
+# del host y cada worker precargado ocupa memoria y una conexión a la base.
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+accesslog = '-'
+
+
+def when_ready(server):
+    # Con preload_app la aplicación ya está cargada en el maestro.
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+
+    from lugares.arranque import precalentar
+
+    tiempos = precalentar(conexiones=False)
+    # Ninguna conexión abierta en el maestro debe heredarse en los workers.
+    connections.close_all()
+    server.log.info("Precalentamiento en el maestro: %s", _formatear(tiempos))
+
+
+def post_worker_init(worker):
+    from lugares.arranque import precalentar
+
+    # Sin preload_app esto también resuelve URLs y compila plantillas aquí.
+    tiempos = precalentar()
+    worker.log.info("Worker %s listo: %s", worker.pid, _formatear(tiempos))
+
+
+def _formatear(tiempos):
+    return ', '.join(f'{paso} {segundos * 1000:.0f} ms' for paso, segundos in tiempos.items())
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LugaresConfig(AppConfig):
     name = 'lugares'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,118 @@
+"""
+Archivo de reseñas antiguas.
+
+La tabla de reseñas (Resena) solo guarda los meses recientes, que son los que
+leen las páginas; las reseñas sin editar desde antes de RESENAS_MESES_ACTIVOS
+se mueven por lotes a ResenaArchivada (texto) y sus calificaciones se suman en
+ResumenResenas, una fila por lugar y mes, de modo que los promedios y
+distribuciones (views.CALIFICACIONES_SQL, lugares.estadisticas) no cambian.
+"""
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import CAMPOS_CALIFICACION, Resena, ResenaArchivada, ResumenResenas, clave_conteo
+
+CLAVES_CONTEO = [clave_conteo(campo, valor) for campo in CAMPOS_CALIFICACION for valor in (1, 2, 3, 4, 5, None)]
+
+
+def limite_activas(meses=None):
+    """Inicio del mes más antiguo que se mantiene en Resena."""
+    if meses is None:
+        meses = settings.RESENAS_MESES_ACTIVOS
+    hoy = timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - 1 - meses
+    return timezone.make_aware(datetime.combine(date(indice // 12, indice % 12 + 1, 1), time.min))
+
+
+def archivar_lote(antes_de, tamano):
+    """
+    Archiva hasta `tamano` reseñas sin editar desde antes de `antes_de`.
+    Devuelve cuántas movió.
+    """
+    with transaction.atomic():
+        # Por la última edición: el upsert conserva creado_en, así que una
+        # reseña antigua editada ayer sigue siendo reciente.
+        ids = list(
+            Resena.objects.filter(actualizado_en__lt=antes_de)
+            .select_for_update()
+            .order_by("pk")
+            .values_list("pk", flat=True)[:tamano]
+        )
+        if not ids:
+            return 0
+        lote = list(Resena.objects.filter(pk__in=ids))
+        # Un lote cabe en memoria: se agrupa aquí por lugar y mes.
+        resumenes = {}
+        for r in lote:
+            periodo = timezone.localtime(r.creado_en).date().replace(day=1)
+            resumen = resumenes.setdefault((r.lugar_id, periodo), ResumenResenas(lugar_id=r.lugar_id, periodo=periodo))
+            resumen.resenas += 1
+            for campo in CAMPOS_CALIFICACION:
+                clave = clave_conteo(campo, getattr(r, campo))
+                setattr(resumen, clave, getattr(resumen, clave) + 1)
+        ResumenResenas.objects.bulk_create(resumenes.values())
+        archivadas = ResenaArchivada.objects.bulk_create([
+            ResenaArchivada(
+                usuario_id=r.usuario_id, lugar_id=r.lugar_id, comentario=r.comentario,
+                ruido=r.ruido, concurrencia=r.concurrencia,
+                infraestructura=r.infraestructura, catalogo=r.catalogo,
+                creado_en=r.creado_en,
+            )
+            for r in lote
+        ])
+        # bulk_create no emite post_save; los receptores (contadores por
+        # usuario) deben ver la alta igual que ven el borrado de la Resena.
+        for archivada in archivadas:
+            post_save.send(
+                sender=ResenaArchivada, instance=archivada, created=True,
+                update_fields=None, raw=False, using=ResenaArchivada.objects.db,
+            )
+        Resena.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def archivar(antes_de=None, tamano=500):
+    """Archiva por lotes (una transacción cada uno) todas las reseñas sin editar desde `antes_de`."""
+    if antes_de is None:
+        antes_de = limite_activas()
+    total = 0
+    while True:
+        movidas = archivar_lote(antes_de, tamano)
+        if not movidas:
+            return total
+        total += movidas
+
+
+def compactar():
+    """
+    Deja una sola fila por lugar y mes en ResumenResenas (los lotes y las
+    reseñas desarchivadas agregan filas). Devuelve cuántas filas eliminó.
+    """
+    grupos = (
+        ResumenResenas.objects.values("lugar_id", "periodo")
+        .annotate(filas=Count("pk"))
+        .filter(filas__gt=1)
+        .order_by()
+    )
+    eliminadas = 0
+    for grupo in grupos:
+        with transaction.atomic():
+            # Solo se suman y borran las filas leídas aquí: las que se inserten
+            # mientras tanto quedan intactas para la próxima compactación.
+            filas = list(
+                ResumenResenas.objects.filter(lugar_id=grupo["lugar_id"], periodo=grupo["periodo"])
+                .select_for_update()
+                .values("pk", "resenas", *CLAVES_CONTEO)
+            )
+            total = {clave: sum(fila[clave] for fila in filas) for clave in ["resenas", *CLAVES_CONTEO]}
+            ResumenResenas.objects.filter(pk__in=[fila["pk"] for fila in filas]).delete()
+            eliminadas += len(filas)
+            if any(total.values()):
+                ResumenResenas.objects.create(lugar_id=grupo["lugar_id"], periodo=grupo["periodo"], **total)
+                eliminadas -= 1
+    return eliminadas
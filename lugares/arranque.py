@@ -0,0 +1,83 @@
+"""
+Precalentamiento de un proceso antes de que reciba tráfico.
+
+Lo que se hace una sola vez por proceso y de otro modo pagaría la primera
+petición: importar y resolver las URLs, compilar las plantillas (quedan en el
+cargador con caché, ver TEMPLATES en settings) y abrir las conexiones a la
+base de datos. gunicorn.conf.py lo llama en el proceso maestro (con
+preload_app los workers heredan URLs y plantillas) y en cada worker para las
+conexiones, que no se pueden compartir entre procesos.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import NoReverseMatch, get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+# Plantillas que se precompilan (además de los DIRS de TEMPLATES).
+DIRECTORIOS_PLANTILLAS = [
+    Path(settings.BASE_DIR) / 'lugares' / 'templates',
+    Path(settings.BASE_DIR) / 'usuarios' / 'templates',
+]
+
+
+def resolver_urls():
+    """Importa el URLconf (y con él las vistas) y llena los índices de reverse()."""
+    # Acceder a reverse_dict importa el URLconf y construye los índices.
+    nombres = [nombre for nombre in get_resolver().reverse_dict if isinstance(nombre, str)]
+    for nombre in nombres:
+        try:
+            reverse(nombre)
+        except NoReverseMatch:
+            # Rutas con argumentos: basta con que el índice ya esté construido.
+            pass
+    return len(nombres)
+
+
+def compilar_plantillas():
+    """Compila todas las plantillas .html de los directorios del proyecto."""
+    motor = engines['django']
+    directorios = [Path(d) for d in motor.dirs] + DIRECTORIOS_PLANTILLAS
+    compiladas = 0
+    for directorio in directorios:
+        for archivo in sorted(directorio.rglob('*.html')):
+            nombre = archivo.relative_to(directorio).as_posix()
+            try:
+                motor.get_template(nombre)
+            except TemplateSyntaxError:
+                logger.exception("No se pudo compilar la plantilla %s", nombre)
+                continue
+            compiladas += 1
+    return compiladas
+
+
+def abrir_conexiones():
+    """
+    Abre (o reutiliza) una conexión por cada base de datos con conexiones
+    persistentes. Con CONN_MAX_AGE=0 (p. ej. bajo ASGI) se cerraría sin usarse.
+    """
+    abiertas = 0
+    for conexion in connections.all():
+        if conexion.settings_dict['CONN_MAX_AGE']:
+            conexion.ensure_connection()
+            abiertas += 1
+    return abiertas
+
+
+def precalentar(conexiones=True):
+    """Ejecuta los pasos anteriores y devuelve los tiempos de cada uno (segundos)."""
+    tiempos = {}
+    for paso, funcion in (('urls', resolver_urls), ('plantillas', compilar_plantillas)):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos[paso] = time.perf_counter() - inicio
+    if conexiones:
+        inicio = time.perf_counter()
+        abrir_conexiones()
+        tiempos['conexiones'] = time.perf_counter() - inicio
+    return tiempos
@@ -0,0 +1,211 @@
+"""
+Registro de cambios para sincronización incremental.
+
+Cada alta o modificación ("guardar") y cada baja ("eliminar") de un Lugar,
+Resena o Lista deja una fila en Cambio dentro de la misma transacción (los
+receptores están en signals.py). Un cliente guarda la secuencia del último
+cambio que procesó y pide los siguientes con `pagina()` o `/cambios/?cursor=`:
+el costo depende de cuántos cambios hubo, no del tamaño de las tablas.
+
+El id se asigna al insertar, pero las transacciones pueden confirmarse en
+otro orden: un cambio con id bajo puede aparecer después de que un cliente
+ya pasó ese id. Por eso el cursor no es el id sino `secuencia`, que
+`numerar()` asigna en orden solo a los cambios ya confirmados (los únicos que
+ve), uno a la vez. Un cambio que se confirma tarde recibe un número mayor que
+todos los ya entregados, así que ningún cliente se lo salta.
+
+`registrar()` programa la numeración para después del commit de la
+transacción que escribe el cambio, así que la lectura (`pagina()`,
+`/cambios/`) no bloquea filas ni escribe. Si un proceso muere entre el
+commit y la numeración, esos cambios se numeran con la próxima escritura o
+con `compactar_cambios`.
+
+Archivar una reseña (lugares/archivo.py) la borra de Resena y se registra
+como "eliminar", aunque siga en ResenaArchivada.
+
+`compactar()` deja solo el último cambio de cada objeto: un cliente que
+sincroniza después ve el mismo estado final con menos filas.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
+
+from .models import Cambio, Lista, Lugar, Resena
+
+# Campos que se entregan de cada modelo junto con el cambio.
+CAMPOS = {
+    "lugar": [
+        "id", "nombre", "tipo", "direccion", "comuna", "descripcion", "imagen_url",
+        "horario_apertura", "horario_cierre", "wifi", "agregado_por_id",
+        "agregado_en", "actualizado_en",
+    ],
+    "resena": [
+        "id", "usuario_id", "lugar_id", "comentario",
+        "ruido", "concurrencia", "infraestructura", "catalogo", "creado_en",
+        "actualizado_en",
+    ],
+    "lista": ["id", "nombre", "usuario_id", "creado_en"],
+}
+
+# Cambios que numerar() asigna por transacción.
+LOTE_NUMERACION = 1000
+
+
+def _modelo(instancia_o_clase):
+    return instancia_o_clase._meta.model_name
+
+
+def registrar(instancia, operacion):
+    Cambio.objects.create(modelo=_modelo(instancia), objeto_id=instancia.pk, operacion=operacion)
+    _programar_numeracion()
+
+
+def registrar_varios(modelo, ids, operacion="guardar"):
+    creados = Cambio.objects.bulk_create([
+        Cambio(modelo=_modelo(modelo), objeto_id=pk, operacion=operacion) for pk in ids
+    ])
+    if creados:
+        _programar_numeracion()
+
+
+def _programar_numeracion():
+    """Numera los cambios al confirmarse la transacción actual (una vez por transacción)."""
+    conexion = transaction.get_connection()
+    if any(funcion is numerar_pendientes for _, funcion, _ in conexion.run_on_commit):
+        return
+    # robust: si la numeración falla, el cambio ya está confirmado y la
+    # respuesta no debe fallar por eso; lo numera la próxima escritura.
+    transaction.on_commit(numerar_pendientes, robust=True)
+
+
+def _objetos(modelo, ids):
+    """Estado actual de los objetos pedidos: {id: dict} (los borrados no aparecen)."""
+    if modelo == "lugar":
+        queryset = Lugar.objects.prefetch_related("etiquetas")
+    elif modelo == "lista":
+        queryset = Lista.objects.prefetch_related("lugares")
+    else:
+        queryset = Resena.objects.all()
+
+    objetos = {}
+    for objeto in queryset.filter(pk__in=ids).order_by():
+        datos = {campo: getattr(objeto, campo) for campo in CAMPOS[modelo]}
+        if modelo == "lugar":
+            datos["etiquetas"] = sorted(e.nombre for e in objeto.etiquetas.all())
+        elif modelo == "lista":
+            datos["lugares"] = sorted(l.pk for l in objeto.lugares.all())
+        objetos[objeto.pk] = datos
+    return objetos
+
+
+def numerar(lote=LOTE_NUMERACION):
+    """
+    Asigna la secuencia, en orden de id, a los cambios confirmados que aún no
+    la tienen. Devuelve cuántos numeró.
+    """
+    try:
+        with transaction.atomic():
+            # El bloqueo serializa a quienes numeran a la vez: el segundo espera
+            # y, al seguir, ya no encuentra esas filas sin número.
+            sin_numero = list(
+                Cambio.objects.select_for_update()
+                .filter(secuencia__isnull=True)
+                .order_by("pk")
+                .only("pk")[:lote]
+            )
+            if not sin_numero:
+                return 0
+            ultima = Cambio.objects.aggregate(ultima=Max("secuencia"))["ultima"] or 0
+            for n, cambio in enumerate(sin_numero, start=1):
+                cambio.secuencia = ultima + n
+            Cambio.objects.bulk_update(sin_numero, ["secuencia"])
+    except IntegrityError:
+        # Otro proceso numeró al mismo tiempo (MySQL); lo que falte, en la próxima.
+        return 0
+    return len(sin_numero)
+
+
+def numerar_pendientes():
+    """Numera todos los cambios confirmados sin secuencia, de a un lote por transacción."""
+    total = 0
+    while True:
+        numerados = numerar()
+        total += numerados
+        if numerados < LOTE_NUMERACION:
+            return total
+
+
+def pagina(cursor=0, limite=100):
+    """
+    Cambios con secuencia mayor que `cursor`, en orden, con el estado actual
+    de cada objeto guardado. Devuelve (cambios, nuevo_cursor, hay_mas).
+    Solo lee: los cambios aún sin secuencia aparecen cuando se numeran.
+    """
+    filas = list(
+        Cambio.objects.filter(secuencia__gt=cursor)
+        .order_by("secuencia")
+        .values("secuencia", "modelo", "objeto_id", "operacion", "creado_en")[:limite + 1]
+    )
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    pendientes = {}
+    for fila in filas:
+        if fila["operacion"] == "guardar":
+            pendientes.setdefault(fila["modelo"], set()).add(fila["objeto_id"])
+    objetos = {modelo: _objetos(modelo, ids) for modelo, ids in pendientes.items()}
+
+    cambios = []
+    for fila in filas:
+        datos = None
+        if fila["operacion"] == "guardar":
+            # None si el objeto se borró después: habrá un "eliminar" más adelante.
+            datos = objetos[fila["modelo"]].get(fila["objeto_id"])
+        cambios.append({
+            "cursor": fila["secuencia"],
+            "modelo": fila["modelo"],
+            "id": fila["objeto_id"],
+            "operacion": fila["operacion"],
+            "fecha": fila["creado_en"],
+            "datos": datos,
+        })
+    return cambios, (filas[-1]["secuencia"] if filas else cursor), hay_mas
+
+
+def iterar(cursor=0, lote=500):
+    """Recorre todos los cambios desde `cursor`, de a `lote` por consulta."""
+    while True:
+        cambios, cursor, hay_mas = pagina(cursor, lote)
+        yield from cambios
+        if not hay_mas:
+            return
+
+
+def compactar(lote=500):
+    """Borra los cambios superados por otro más nuevo del mismo objeto. Devuelve cuántos borró."""
+    # Solo los ya numerados: son los que se entregan y los que tienen orden.
+    grupos = (
+        Cambio.objects.filter(secuencia__isnull=False)
+        .values("modelo", "objeto_id")
+        .annotate(filas=Count("pk"), ultimo=Max("secuencia"))
+        .filter(filas__gt=1)
+        .order_by()
+    )
+    borrados = 0
+    condiciones = []
+    for grupo in list(grupos):
+        condiciones.append(Q(modelo=grupo["modelo"], objeto_id=grupo["objeto_id"], secuencia__lt=grupo["ultimo"]))
+        if len(condiciones) == lote:
+            borrados += _borrar(condiciones)
+            condiciones = []
+    if condiciones:
+        borrados += _borrar(condiciones)
+    return borrados
+
+
+def _borrar(condiciones):
+    filtro = Q()
+    for condicion in condiciones:
+        filtro |= condicion
+    with transaction.atomic():
+        borrados, _ = Cambio.objects.filter(filtro).delete()
+    return borrados
@@ -0,0 +1,193 @@
+"""
+Cola de trabajos en segundo plano guardada en la propia base de datos.
+
+No necesita broker externo: las tareas son filas de Tarea y las ejecuta
+`python manage.py procesar_tareas` (una o varias instancias/procesos).
+
+    from lugares.cola import encolar
+    encolar('miniaturas.generar', {'url': url}, clave=f'miniaturas:{url}')
+
+Las funciones se registran con el decorador @tarea en el módulo `tareas.py`
+de cada app, que el worker importa al arrancar. Una tarea que lanza una
+excepción se reintenta con espera exponencial hasta `max_intentos`.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+COMPLETADA = 'completada'
+FALLIDA = 'fallida'
+
+_registro = {}
+
+
+def tarea(nombre):
+    """Registra una función como tarea ejecutable por el worker."""
+    def decorador(func):
+        _registro[nombre] = func
+        return func
+    return decorador
+
+
+def encolar(nombre, argumentos=None, clave=None, retraso=0, max_intentos=5):
+    """
+    Añade una tarea a la cola. Si se indica `clave` y ya hay una tarea
+    pendiente con esa clave, no se crea otra y se devuelve la existente.
+    Se puede llamar dentro de una transacción: la tarea solo será visible
+    para los workers si la transacción se confirma.
+    """
+    if clave:
+        existente = Tarea.objects.filter(clave_activa=clave).first()
+        if existente is not None:
+            return existente
+    try:
+        with transaction.atomic():
+            return Tarea.objects.create(
+                nombre=nombre,
+                argumentos=argumentos or {},
+                clave=clave,
+                clave_activa=clave,
+                max_intentos=max_intentos,
+                ejecutar_desde=timezone.now() + timedelta(seconds=retraso),
+            )
+    except IntegrityError:
+        # Otra petición encoló la misma clave entre la consulta y el insert.
+        return Tarea.objects.filter(clave_activa=clave).first()
+
+
+def reclamar():
+    """
+    Marca como en curso la siguiente tarea lista y la devuelve (o None).
+    El UPDATE condicionado al estado garantiza que dos workers no tomen la
+    misma tarea, en cualquier motor de base de datos.
+    """
+    ahora = timezone.now()
+    candidatas = list(
+        Tarea.objects.filter(estado=PENDIENTE, ejecutar_desde__lte=ahora)
+        .order_by('ejecutar_desde')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidatas:
+        tomada = Tarea.objects.filter(pk=pk, estado=PENDIENTE).update(
+            estado=EN_CURSO, iniciada_en=ahora, intentos=F('intentos') + 1, clave_activa=None,
+        )
+        if tomada:
+            return Tarea.objects.get(pk=pk)
+    return None
+
+
+def _reclamada(tarea_obj):
+    """
+    La tarea, solo si sigue en curso con este mismo reclamo. Si entretanto se
+    recuperó por colgada (y quizá la tomó otro worker), no se toca.
+    """
+    return Tarea.objects.filter(pk=tarea_obj.pk, estado=EN_CURSO, iniciada_en=tarea_obj.iniciada_en)
+
+
+def ejecutar(tarea_obj):
+    """Ejecuta una tarea ya reclamada y registra el resultado."""
+    func = _registro.get(tarea_obj.nombre)
+    try:
+        if func is None:
+            raise LookupError(f"No hay ninguna tarea registrada como '{tarea_obj.nombre}'.")
+        func(**tarea_obj.argumentos)
+    except Exception:
+        logger.exception("Falló la tarea %s (intento %s)", tarea_obj.pk, tarea_obj.intentos)
+        _fallar(tarea_obj, traceback.format_exc())
+        return False
+    _reclamada(tarea_obj).update(estado=COMPLETADA, terminada_en=timezone.now())
+    return True
+
+
+def _fallar(tarea_obj, error):
+    """Reprograma la tarea o la da por fallida. Devuelve False si ya no estaba reclamada."""
+    ahora = timezone.now()
+    if tarea_obj.intentos >= tarea_obj.max_intentos:
+        return bool(_reclamada(tarea_obj).update(
+            estado=FALLIDA, terminada_en=ahora, ultimo_error=error,
+        ))
+    espera = min(settings.TAREAS_ESPERA_BASE * 2 ** (tarea_obj.intentos - 1), 3600)
+    try:
+        with transaction.atomic():
+            return bool(_reclamada(tarea_obj).update(
+                estado=PENDIENTE,
+                clave_activa=F('clave'),
+                ejecutar_desde=ahora + timedelta(seconds=espera),
+                ultimo_error=error,
+            ))
+    except IntegrityError:
+        # Ya hay otra tarea pendiente con la misma clave que hará el trabajo.
+        return bool(_reclamada(tarea_obj).update(
+            estado=FALLIDA, terminada_en=ahora, ultimo_error=error,
+        ))
+
+
+def recuperar_colgadas():
+    """Devuelve a la cola las tareas en curso de workers que murieron."""
+    limite = timezone.now() - timedelta(seconds=settings.TAREAS_TIMEOUT)
+    colgadas = Tarea.objects.filter(estado=EN_CURSO, iniciada_en__lt=limite)
+    recuperadas = 0
+    for tarea_obj in colgadas:
+        # Si terminó mientras tanto, _fallar no la encuentra en curso y no la toca.
+        if _fallar(tarea_obj, "Tiempo de ejecución agotado (worker caído)."):
+            recuperadas += 1
+    return recuperadas
+
+
+def purgar():
+    """Borra las tareas terminadas más antiguas que TAREAS_RETENCION_DIAS."""
+    limite = timezone.now() - timedelta(days=settings.TAREAS_RETENCION_DIAS)
+    borradas, _ = Tarea.objects.filter(
+        estado__in=[COMPLETADA, FALLIDA], terminada_en__lt=limite,
+    ).delete()
+    return borradas
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    return valores[max(0, min(len(valores) - 1, round(p / 100 * len(valores)) - 1))]
+
+
+def estadisticas():
+    """Profundidad de la cola y latencias recientes (segundos)."""
+    ahora = timezone.now()
+    por_estado = dict(
+        Tarea.objects.values_list('estado').annotate(total=Count('pk')).order_by()
+    )
+    mas_antigua = (
+        Tarea.objects.filter(estado=PENDIENTE, ejecutar_desde__lte=ahora)
+        .order_by('ejecutar_desde')
+        .values_list('ejecutar_desde', flat=True)
+        .first()
+    )
+    # Las 1000 más recientes. La espera se mide desde que la tarea podía
+    # ejecutarse: un retraso pedido o la espera entre reintentos no es latencia.
+    recientes = Tarea.objects.filter(
+        estado=COMPLETADA, terminada_en__gte=ahora - timedelta(hours=1),
+    ).order_by('-terminada_en').values_list('ejecutar_desde', 'iniciada_en', 'terminada_en')[:1000]
+    espera = sorted(max(0, (inicio - desde).total_seconds()) for desde, inicio, _ in recientes)
+    duracion = sorted((fin - inicio).total_seconds() for _, inicio, fin in recientes)
+    return {
+        'pendientes': por_estado.get(PENDIENTE, 0),
+        'en_curso': por_estado.get(EN_CURSO, 0),
+        'fallidas': por_estado.get(FALLIDA, 0),
+        'completadas': por_estado.get(COMPLETADA, 0),
+        'espera_mas_antigua': (ahora - mas_antigua).total_seconds() if mas_antigua else 0,
+        'completadas_ultima_hora': len(duracion),
+        'espera_p50': _percentil(espera, 50),
+        'espera_p95': _percentil(espera, 95),
+        'duracion_p50': _percentil(duracion, 50),
+        'duracion_p95': _percentil(duracion, 95),
+    }
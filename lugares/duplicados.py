@@ -0,0 +1,212 @@
+"""
+Detección y fusión de lugares duplicados.
+
+Comparar todos los lugares entre sí es O(n²), así que primero se agrupan en
+bloques que probablemente contienen a los duplicados (misma clave fonética del
+nombre, o misma comuna y misma palabra principal) y solo se puntúan los pares
+de cada bloque. Los campos normalizados se guardan en Lugar (ver
+lugares/normalizacion.py). Al crear un lugar, la revisión busca por índice los
+de igual clave fonética o de la misma comuna; la palabra principal se filtra
+con un LIKE '%palabra%', que no usa índice y recorre solo los lugares de esa
+comuna. Luego se puntúan unos pocos candidatos.
+
+`fusionar()` junta un duplicado con el lugar que se conserva: mueve reseñas
+(resolviendo las de un mismo usuario en ambos), resúmenes archivados,
+etiquetas y listas, y borra el duplicado.
+"""
+import re
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cambios, estadisticas
+from .models import Lista, Lugar, Resena, ResenaArchivada, ResumenResenas
+from .normalizacion import clave_fonetica, normalizar, palabras_significativas
+
+# Puntaje desde el que dos lugares se consideran el mismo.
+UMBRAL = 0.8
+
+# Bloques más grandes se recorren con una ventana sobre los nombres ordenados
+# en vez de comparar todos los pares.
+MAX_BLOQUE = 200
+VENTANA = 20
+
+# Palabras muy comunes en los nombres, que no sirven para formar bloques.
+GENERICAS = {
+    "biblioteca", "cafe", "cafeteria", "centro", "cowork", "coworking", "espacio",
+    "literario", "municipal", "publica", "sala", "universidad", "facultad",
+}
+
+CAMPOS_COMPARACION = ("pk", "nombre", "nombre_normalizado", "comuna_normalizada", "clave_fonetica", "direccion")
+
+
+def palabra_principal(nombre_normalizado):
+    palabras = palabras_significativas(nombre_normalizado)
+    especificas = [p for p in palabras if p not in GENERICAS]
+    return (especificas or palabras or [""])[0]
+
+
+def _similitud_nombre(a, b):
+    palabras_a, palabras_b = set(a.split()), set(b.split())
+    if not palabras_a or not palabras_b:
+        return 0.0
+    jaccard = len(palabras_a & palabras_b) / len(palabras_a | palabras_b)
+    # Palabras ordenadas: "Nacional Biblioteca" y "Biblioteca Nacional" son iguales.
+    ordenadas = SequenceMatcher(None, " ".join(sorted(palabras_a)), " ".join(sorted(palabras_b))).ratio()
+    return max(jaccard, ordenadas)
+
+
+def _similitud_direccion(a, b):
+    if not a or not b:
+        return None
+    similitud = SequenceMatcher(None, a, b).ratio()
+    numeros_a, numeros_b = set(re.findall(r"\d+", a)), set(re.findall(r"\d+", b))
+    if numeros_a and numeros_b and not numeros_a & numeros_b:
+        # Misma calle con otra numeración: casi seguro otro lugar.
+        similitud *= 0.5
+    return similitud
+
+
+def similitud(a, b):
+    """Puntaje entre 0 y 1 de dos lugares (dicts con los CAMPOS_COMPARACION)."""
+    nombre = _similitud_nombre(a["nombre_normalizado"], b["nombre_normalizado"])
+    direccion = _similitud_direccion(normalizar(a["direccion"]), normalizar(b["direccion"]))
+    comuna = 1.0 if a["comuna_normalizada"] == b["comuna_normalizada"] else 0.0
+    if direccion is None:
+        return round(0.8 * nombre + 0.2 * comuna, 3)
+    return round(0.55 * nombre + 0.3 * direccion + 0.15 * comuna, 3)
+
+
+def claves_bloque(lugar):
+    # Un nombre sin palabras no forma bloque: juntaría lugares sin relación.
+    claves = []
+    if lugar["clave_fonetica"]:
+        claves.append(f"f:{lugar['clave_fonetica']}")
+    palabra = palabra_principal(lugar["nombre_normalizado"])
+    if palabra:
+        claves.append(f"c:{lugar['comuna_normalizada']}:{palabra}")
+    return claves
+
+
+def pares_candidatos(lugares):
+    """Pares (i, j) de índices de `lugares` que comparten algún bloque, sin repetir."""
+    bloques = {}
+    for indice, lugar in enumerate(lugares):
+        for clave in claves_bloque(lugar):
+            bloques.setdefault(clave, []).append(indice)
+
+    pares = set()
+    for indices in bloques.values():
+        if len(indices) <= MAX_BLOQUE:
+            pares.update((i, j) for n, i in enumerate(indices) for j in indices[n + 1:])
+            continue
+        indices = sorted(indices, key=lambda i: lugares[i]["nombre_normalizado"])
+        for n, i in enumerate(indices):
+            pares.update((min(i, j), max(i, j)) for j in indices[n + 1:n + 1 + VENTANA])
+    return pares
+
+
+def puntuar_pares(lugares, pares, umbral=UMBRAL):
+    """[(puntaje, pk_a, pk_b)] de los pares que superan el umbral."""
+    resultado = []
+    for i, j in pares:
+        puntaje = similitud(lugares[i], lugares[j])
+        if puntaje >= umbral:
+            resultado.append((puntaje, lugares[i]["pk"], lugares[j]["pk"]))
+    return resultado
+
+
+def similares(nombre, comuna, direccion="", excluir=None, umbral=UMBRAL, limite=5):
+    """
+    Lugares existentes que parecen el mismo que el descrito, del más al menos
+    parecido. Solo lee los candidatos de sus bloques: la clave fonética y la
+    comuna se buscan por índice; la palabra principal, dentro de la comuna.
+    """
+    nombre_normalizado = normalizar(nombre)
+    nuevo = {
+        "pk": None,
+        "nombre": nombre,
+        "nombre_normalizado": nombre_normalizado,
+        "comuna_normalizada": normalizar(comuna),
+        "clave_fonetica": clave_fonetica(nombre_normalizado),
+        "direccion": direccion,
+    }
+
+    # Con la palabra vacía, __contains="" traería todos los lugares de la comuna.
+    filtro = Q()
+    if nuevo["clave_fonetica"]:
+        filtro |= Q(clave_fonetica=nuevo["clave_fonetica"])
+    palabra = palabra_principal(nombre_normalizado)
+    if palabra:
+        filtro |= Q(comuna_normalizada=nuevo["comuna_normalizada"], nombre_normalizado__contains=palabra)
+    if not filtro:
+        return []
+    candidatos = Lugar.objects.filter(filtro)
+    if excluir is not None:
+        candidatos = candidatos.exclude(pk=excluir)
+    puntuados = []
+    for candidato in candidatos.values(*CAMPOS_COMPARACION)[:MAX_BLOQUE]:
+        puntaje = similitud(nuevo, candidato)
+        if puntaje >= umbral:
+            puntuados.append((puntaje, candidato))
+    puntuados.sort(key=lambda x: x[0], reverse=True)
+    return [dict(candidato, puntaje=puntaje) for puntaje, candidato in puntuados[:limite]]
+
+
+@transaction.atomic
+def fusionar(destino, origen):
+    """
+    Pasa todo lo de `origen` a `destino` y borra `origen`. Si un usuario
+    reseñó ambos queda una sola reseña suya: la activa o, entre dos del mismo
+    tipo, la más reciente. Devuelve cuántas reseñas activas movió.
+    """
+    if destino.pk == origen.pk:
+        raise ValueError("No se puede fusionar un lugar consigo mismo.")
+    # Bloquea ambos lugares para que no cambien durante la fusión.
+    list(Lugar.objects.select_for_update().filter(pk__in=[destino.pk, origen.pk]))
+
+    # Reseñas activas de un mismo usuario en ambos: se conserva la más reciente.
+    en_destino = {r.usuario_id: r for r in Resena.objects.filter(lugar=destino)}
+    for resena in Resena.objects.filter(lugar=origen, usuario_id__in=list(en_destino)):
+        if resena.creado_en > en_destino[resena.usuario_id].creado_en:
+            en_destino[resena.usuario_id].delete()
+        else:
+            resena.delete()
+
+    # Con archivadas de por medio prevalece la activa, y entre dos archivadas
+    # la más reciente. desarchivar() borra la otra y resta su aporte a los resúmenes.
+    activos_origen = set(Resena.objects.filter(lugar=origen).values_list("usuario_id", flat=True))
+    activos_destino = set(Resena.objects.filter(lugar=destino).values_list("usuario_id", flat=True))
+    for archivada in ResenaArchivada.objects.filter(lugar=destino, usuario_id__in=activos_origen):
+        archivada.desarchivar()
+    for archivada in ResenaArchivada.objects.filter(lugar=origen, usuario_id__in=activos_destino):
+        archivada.desarchivar()
+    archivadas_destino = {a.usuario_id: a for a in ResenaArchivada.objects.filter(lugar=destino)}
+    for archivada in ResenaArchivada.objects.filter(lugar=origen, usuario_id__in=list(archivadas_destino)):
+        otra = archivadas_destino[archivada.usuario_id]
+        (otra if archivada.creado_en > otra.creado_en else archivada).desarchivar()
+
+    # Sin conflictos restantes: se mueve todo en bloque.
+    movidas = list(Resena.objects.filter(lugar=origen).values_list("pk", flat=True))
+    Resena.objects.filter(pk__in=movidas).update(lugar=destino)
+    cambios.registrar_varios(Resena, movidas)
+    ResenaArchivada.objects.filter(lugar=origen).update(lugar=destino)
+    ResumenResenas.objects.filter(lugar=origen).update(lugar=destino)
+
+    destino.etiquetas.add(*origen.etiquetas.all())
+
+    Membresia = Lista.lugares.through
+    listas = Membresia.objects.filter(lugar=origen).exclude(
+        lista__in=Membresia.objects.filter(lugar=destino).values("lista")
+    ).values_list("lista_id", flat=True)
+    Membresia.objects.bulk_create([Membresia(lista_id=lista_id, lugar=destino) for lista_id in listas])
+
+    # update() no emite señales: se registra el cambio del destino aquí. El
+    # borrado del origen registra e invalida lo suyo (y las listas) por signals.py.
+    Lugar.objects.filter(pk=destino.pk).update(actualizado_en=timezone.now())
+    cambios.registrar(destino, "guardar")
+    origen.delete()
+    transaction.on_commit(lambda: estadisticas.invalidar(destino.pk))
+    return len(movidas)
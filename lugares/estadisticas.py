@@ -0,0 +1,106 @@
+"""
+Distribución de calificaciones por dimensión (cuántas reseñas dieron 1, 2, ...
+5 o "no aplica" en ruido, concurrencia, infraestructura y catálogo).
+
+Los 24 conteos de cada lugar salen de una sola consulta con agregación
+condicional (COUNT ... FILTER / SUM(CASE ...)), y la versión masiva resuelve
+una página entera de lugares con esa misma consulta. Los resultados se
+guardan en la caché ESTADISTICAS_CACHE_ALIAS por lugar y se invalidan al
+cambiar sus reseñas (ver lugares/signals.py). Esa caché tiene que ser
+compartida entre procesos: la invalidación la hace quien escribe (un worker
+web, la cola o un comando) y debe verse en todos. Las reseñas archivadas aportan a través de los
+contadores de ResumenResenas, que usan los mismos nombres.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q, Sum
+
+from .models import Resena, ResumenResenas, clave_conteo
+
+DIMENSIONES = [
+    ("ruido", "Ruido"),
+    ("concurrencia", "Concurrencia"),
+    ("infraestructura", "Infraestructura"),
+    ("catalogo", "Catálogo"),
+]
+VALORES = (1, 2, 3, 4, 5)
+# Tope por si la caché no llega a todas las máquinas (ver settings.CACHES).
+CACHE_TIMEOUT = 60 * 60
+
+
+def _cache():
+    return caches[settings.ESTADISTICAS_CACHE_ALIAS]
+
+
+def clave_cache(lugar_id):
+    return f"distribucion:{lugar_id}"
+
+
+def agregaciones_conteo():
+    agregaciones = {}
+    for campo, _ in DIMENSIONES:
+        for valor in VALORES:
+            agregaciones[clave_conteo(campo, valor)] = Count("pk", filter=Q(**{campo: valor}))
+        agregaciones[clave_conteo(campo, None)] = Count("pk", filter=Q(**{f"{campo}__isnull": True}))
+    return agregaciones
+
+
+def _sumas_archivadas():
+    return {clave: Sum(clave) for clave in agregaciones_conteo()}
+
+
+def _distribucion(fila=None):
+    """Convierte una fila de conteos (o None si no hay reseñas) en la estructura para las plantillas."""
+    dimensiones = []
+    for campo, nombre in DIMENSIONES:
+        conteos = [fila[f"{campo}_{valor}"] if fila else 0 for valor in VALORES]
+        no_aplica = fila[f"{campo}_na"] if fila else 0
+        maximo = max(conteos) or 1
+        dimensiones.append({
+            "campo": campo,
+            "nombre": nombre,
+            "conteos": conteos,
+            "barras": [(valor, n, round(100 * n / maximo)) for valor, n in zip(VALORES, conteos)],
+            "no_aplica": no_aplica,
+            "total": sum(conteos) + no_aplica,
+        })
+    return dimensiones
+
+
+def distribuciones(lugar_ids):
+    """Distribuciones de varios lugares: {lugar_id: [dimensión, ...]}."""
+    lugar_ids = list(lugar_ids)
+    cacheadas = _cache().get_many([clave_cache(pk) for pk in lugar_ids])
+    resultado = {pk: cacheadas[clave_cache(pk)] for pk in lugar_ids if clave_cache(pk) in cacheadas}
+
+    faltantes = [pk for pk in lugar_ids if pk not in resultado]
+    if faltantes:
+        filas = (
+            Resena.objects.filter(lugar_id__in=faltantes)
+            .values("lugar_id")
+            .annotate(**agregaciones_conteo())
+            .order_by()
+        )
+        archivadas = (
+            ResumenResenas.objects.filter(lugar_id__in=faltantes)
+            .values("lugar_id")
+            .annotate(**_sumas_archivadas())
+            .order_by()
+        )
+        sumas = {}
+        for fila in [*filas, *archivadas]:
+            suma = sumas.setdefault(fila.pop("lugar_id"), dict.fromkeys(fila, 0))
+            for clave, n in fila.items():
+                suma[clave] += n or 0
+        calculadas = {pk: _distribucion(sumas.get(pk)) for pk in faltantes}
+        _cache().set_many({clave_cache(pk): d for pk, d in calculadas.items()}, CACHE_TIMEOUT)
+        resultado.update(calculadas)
+    return resultado
+
+
+def distribucion(lugar_id):
+    return distribuciones([lugar_id])[lugar_id]
+
+
+def invalidar(lugar_id):
+    _cache().delete(clave_cache(lugar_id))
@@ -1,3 +1,5 @@
+import uuid
+
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
@@ -62,6 +64,9 @@ VALORES_CALIFICACION = [
 ]
 
 class ResenaForm(forms.ModelForm):
+    # Identifica cada formulario mostrado; permite ignorar reenvíos del mismo.
+    token = forms.UUIDField(widget=forms.HiddenInput, initial=uuid.uuid4, required=False)
+
     class Meta:
         model = Resena
         fields = ["comentario", "ruido", "concurrencia", "infraestructura", "catalogo"]
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lugares import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las reseñas sin editar en RESENAS_MESES_ACTIVOS meses a ResenaArchivada "
+        "y suma sus calificaciones en ResumenResenas (lugares/archivo.py), por lotes. "
+        "Los promedios y distribuciones no cambian."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=None,
+            help="Meses que quedan en la tabla activa (por defecto, RESENAS_MESES_ACTIVOS).",
+        )
+        parser.add_argument('--lote', type=int, default=500, help="Reseñas por transacción.")
+        parser.add_argument(
+            '--sin-compactar', action='store_true',
+            help="No une las filas de resumen de un mismo lugar y mes al terminar.",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        antes_de = archivo.limite_activas(options['meses'])
+        movidas = archivo.archivar(antes_de, options['lote'])
+        compactadas = 0 if options['sin_compactar'] else archivo.compactar()
+        self.stdout.write(self.style.SUCCESS(
+            f"{movidas} reseñas sin editar desde {antes_de:%Y-%m-%d} archivadas, "
+            f"{compactadas} filas de resumen compactadas en {time.perf_counter() - inicio:.1f}s"
+        ))
@@ -0,0 +1,375 @@
+import json
+import random
+import re
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from lugares.models import TIPO_LUGAR_CHOICES, Cambio, Etiqueta, Lista, Lugar, Resena, ResenaArchivada
+from usuarios import actividad
+
+# Tablas cuyas consultas e índices se auditan.
+TABLAS = [
+    Lugar._meta.db_table,
+    Resena._meta.db_table,
+    Lista._meta.db_table,
+    Etiqueta._meta.db_table,
+    Lugar.etiquetas.through._meta.db_table,
+    Lista.lugares.through._meta.db_table,
+    ResenaArchivada._meta.db_table,
+    Cambio._meta.db_table,
+]
+
+
+def _urls_a_auditar():
+    """URLs públicas de cada vista, con objetos de ejemplo de la base de datos."""
+    lugar = Lugar.objects.order_by('pk').first()
+    lista = Lista.objects.order_by('pk').first()
+    etiqueta = Etiqueta.objects.order_by('pk').first()
+    resena = Resena.objects.order_by('pk').first()
+
+    urls = [
+        reverse('index'),
+        reverse('lista_lugares'),
+        reverse('lista_lugares') + '?page=2',
+        reverse('lista_resenas'),
+        reverse('lista_listas'),
+        reverse('lista_etiquetas'),
+        reverse('calificaciones_sql'),
+    ]
+    if lugar:
+        urls += [reverse('detalle_lugar', args=[lugar.pk]), reverse('lista_resenas') + f'?lugar={lugar.pk}']
+    if lista:
+        urls.append(reverse('detalle_lista', args=[lista.pk]))
+    if etiqueta:
+        urls.append(reverse('lista_etiquetas') + f'?etiqueta={etiqueta.nombre}')
+    if resena:
+        urls.append(reverse('detalle_resena', args=[resena.pk]))
+        # Perfil del autor: primera página y la siguiente (con cursor).
+        usuario = resena.usuario
+        urls.append(reverse('perfil', args=[usuario.username]))
+        _, siguiente = actividad.pagina(usuario)
+        if siguiente:
+            urls.append(reverse('perfil', args=[usuario.username]) + f'?antes={siguiente}')
+
+    # Registro de cambios: desde el principio y desde un cursor reciente.
+    urls.append(reverse('cambios') + '?cursor=0')
+    ultima = Cambio.objects.filter(secuencia__isnull=False).order_by('-secuencia').values_list('secuencia', flat=True).first()
+    if ultima:
+        urls.append(reverse('cambios') + f'?cursor={max(0, ultima - 100)}')
+    return urls
+
+
+def _capturar_consultas(url):
+    """Ejecuta la vista como visitante anónimo y devuelve los SELECT emitidos (sql, params)."""
+    consultas = []
+
+    def _registrar(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            consultas.append((sql, params))
+        return execute(sql, params, many, context)
+
+    # Sin la caché de página anónima, para que la vista realmente consulte.
+    with override_settings(ALLOWED_HOSTS=['testserver'], CACHE_ANONIMA_VISTAS={}):
+        with connection.execute_wrapper(_registrar):
+            status = Client().get(url).status_code
+    return status, consultas
+
+
+# --- Planes de ejecución -----------------------------------------------------
+
+def _explicar_sqlite(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        filas = cursor.fetchall()
+    detalles = [fila[-1] for fila in filas]
+    # SQLite nombra las tablas por su alias en el plan (p. ej. "SCAN l").
+    alias = dict(
+        (a, t) for t, a in re.findall(r'(?:FROM|JOIN)\s+"?(\w+)"?\s+(?:AS\s+)?"?(\w+)"?', sql)
+    )
+    resultado = {'plan': detalles, 'escaneos_secuenciales': [], 'ordenamientos': [], 'indices_usados': []}
+    for detalle in detalles:
+        escaneo = re.match(r'SCAN (\w+)(?: AS \w+)?$', detalle)
+        if escaneo:
+            resultado['escaneos_secuenciales'].append(alias.get(escaneo.group(1), escaneo.group(1)))
+        indice = re.search(r'USING (?:COVERING )?INDEX (\w+)', detalle)
+        if indice:
+            resultado['indices_usados'].append(indice.group(1))
+        if 'USE TEMP B-TREE' in detalle:
+            resultado['ordenamientos'].append({'detalle': detalle, 'en_disco': None})
+    return resultado
+
+
+def _explicar_postgresql(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    plan = plan[0]
+    resultado = {
+        'plan': plan,
+        'tiempo_ms': plan.get('Execution Time'),
+        'escaneos_secuenciales': [],
+        'ordenamientos': [],
+        'indices_usados': [],
+    }
+
+    def _recorrer(nodo):
+        tipo = nodo.get('Node Type')
+        if tipo == 'Seq Scan':
+            resultado['escaneos_secuenciales'].append(nodo.get('Relation Name'))
+        if nodo.get('Index Name'):
+            resultado['indices_usados'].append(nodo['Index Name'])
+        if tipo in ('Sort', 'Incremental Sort'):
+            resultado['ordenamientos'].append({
+                'detalle': nodo.get('Sort Method'),
+                'en_disco': nodo.get('Sort Space Type') == 'Disk',
+            })
+        for hijo in nodo.get('Plans', []):
+            _recorrer(hijo)
+
+    _recorrer(plan['Plan'])
+    return resultado
+
+
+EXPLICADORES = {
+    'sqlite': _explicar_sqlite,
+    'postgresql': _explicar_postgresql,
+}
+
+
+# --- Índices existentes ------------------------------------------------------
+
+def _indices():
+    """{tabla: [{'nombre', 'columnas', 'unico', 'pk'}]} según la introspección del motor."""
+    resultado = {}
+    with connection.cursor() as cursor:
+        for tabla in TABLAS:
+            restricciones = connection.introspection.get_constraints(cursor, tabla)
+            resultado[tabla] = [
+                {
+                    'nombre': nombre,
+                    'columnas': datos['columns'],
+                    'unico': bool(datos['unique']),
+                    'pk': bool(datos['primary_key']),
+                }
+                for nombre, datos in restricciones.items()
+                if (datos['index'] or datos['unique'] or datos['primary_key']) and datos['columns']
+            ]
+    return resultado
+
+
+def _indices_duplicados(indices):
+    """Índices con las mismas columnas que otro, o cuyas columnas son prefijo de otro."""
+    duplicados = []
+    for tabla, lista in indices.items():
+        for indice in lista:
+            if indice['pk'] or indice['unico']:
+                continue
+            for otro in lista:
+                if otro is indice:
+                    continue
+                n = len(indice['columnas'])
+                if otro['columnas'][:n] == indice['columnas'] and (
+                    len(otro['columnas']) > n or otro['pk'] or otro['unico'] or otro['nombre'] < indice['nombre']
+                ):
+                    duplicados.append({
+                        'tabla': tabla,
+                        'indice': indice['nombre'],
+                        'columnas': indice['columnas'],
+                        'cubierto_por': otro['nombre'],
+                    })
+                    break
+    return duplicados
+
+
+def _indices_no_usados(indices, usados):
+    """
+    En PostgreSQL, los que no registran ningún escaneo en pg_stat_user_indexes;
+    en el resto, los que no aparecen en ningún plan de las consultas auditadas.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexrelname FROM pg_stat_user_indexes WHERE idx_scan > 0 AND relname = ANY(%s)',
+                [TABLAS],
+            )
+            usados = {fila[0] for fila in cursor.fetchall()}
+    return [
+        {'tabla': tabla, 'indice': indice['nombre'], 'columnas': indice['columnas']}
+        for tabla, lista in indices.items()
+        for indice in lista
+        if not indice['pk'] and not indice['unico'] and indice['nombre'] not in usados
+    ]
+
+
+def _columnas(sql, tabla, sufijo=''):
+    return re.findall(rf'"{tabla}"\."(\w+)"\s*{sufijo}', sql)
+
+
+def _indices_sugeridos(consultas, indices):
+    """
+    Para cada escaneo secuencial u ordenamiento sobre una tabla, propone un
+    índice compuesto (columnas de igualdad del WHERE + columnas del ORDER BY)
+    si ningún índice existente empieza por esas columnas.
+    """
+    sugeridos = {}
+    for consulta in consultas:
+        sql = consulta['sql']
+        cuerpo, _, orden = sql.partition(' ORDER BY ')
+        donde = cuerpo.partition(' WHERE ')[2].partition(' GROUP BY ')[0]
+
+        tablas = set(consulta['escaneos_secuenciales'])
+        if consulta['ordenamientos']:
+            tablas |= set(re.findall(r'"(\w+)"\."\w+"', orden))
+        for tabla in tablas & set(indices):
+            columnas = list(dict.fromkeys(
+                _columnas(donde, tabla, r'(?:=|IN\b)') + _columnas(orden, tabla)
+            ))
+            if not columnas:
+                continue
+            if any(i['columnas'][:len(columnas)] == columnas for i in indices[tabla]):
+                continue
+            sugerido = sugeridos.setdefault(
+                (tabla, tuple(columnas)), {'tabla': tabla, 'columnas': columnas, 'vistas': []},
+            )
+            if consulta['vista'] not in sugerido['vistas']:
+                sugerido['vistas'].append(consulta['vista'])
+    return list(sugeridos.values())
+
+
+# --- Datos de prueba ---------------------------------------------------------
+
+def _sembrar(n_lugares, resenas_por_lugar):
+    """Crea datos sintéticos (dentro de la transacción que el comando revierte)."""
+    User = get_user_model()
+    usuarios = User.objects.bulk_create([
+        User(username=f'auditoria_{i}') for i in range(resenas_por_lugar)
+    ])
+    etiquetas = Etiqueta.objects.bulk_create([Etiqueta(nombre=f'auditoria_{i}') for i in range(20)])
+    tipos = [tipo for tipo, _ in TIPO_LUGAR_CHOICES]
+    lugares = Lugar.objects.bulk_create([
+        Lugar(
+            nombre=f'Lugar {i}', tipo=random.choice(tipos), comuna=f'Comuna {i % 40}',
+            descripcion='', agregado_por=random.choice(usuarios),
+        )
+        for i in range(n_lugares)
+    ])
+    Lugar.etiquetas.through.objects.bulk_create([
+        Lugar.etiquetas.through(lugar_id=lugar.pk, etiqueta_id=random.choice(etiquetas).pk)
+        for lugar in lugares
+    ])
+    Resena.objects.bulk_create([
+        Resena(
+            usuario=usuario, lugar=lugar, comentario='',
+            ruido=random.choice([None, 1, 2, 3, 4, 5]),
+            concurrencia=random.choice([None, 1, 2, 3, 4, 5]),
+            infraestructura=random.choice([None, 1, 2, 3, 4, 5]),
+            catalogo=random.choice([None, 1, 2, 3, 4, 5]),
+        )
+        for lugar in lugares
+        for usuario in usuarios
+    ], batch_size=1000)
+    listas = Lista.objects.bulk_create([Lista(nombre=f'Lista {i}', usuario=u) for i, u in enumerate(usuarios)])
+    Lista.lugares.through.objects.bulk_create([
+        Lista.lugares.through(lista_id=lista.pk, lugar_id=lugar.pk)
+        for lista in listas
+        for lugar in random.sample(lugares, min(10, len(lugares)))
+    ])
+    if connection.vendor in ('postgresql', 'sqlite'):
+        # Estadísticas actualizadas para que el planificador vea los datos nuevos.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las consultas de cada vista y analiza sus planes (EXPLAIN ANALYZE en "
+        "PostgreSQL, EXPLAIN QUERY PLAN en SQLite): escaneos secuenciales, ordenamientos "
+        "en disco, índices duplicados o sin uso e índices compuestos sugeridos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sembrar', type=int, default=0, metavar='N',
+            help="Crea N lugares sintéticos (con reseñas y listas) antes de auditar; se revierten al terminar.",
+        )
+        parser.add_argument('--resenas-por-lugar', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help="Salida en JSON para comparar entre versiones.")
+
+    def handle(self, *args, **options):
+        explicar = EXPLICADORES.get(connection.vendor)
+        with transaction.atomic():
+            if options['sembrar']:
+                _sembrar(options['sembrar'], options['resenas_por_lugar'])
+            informe = self._auditar(explicar)
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(informe, indent=2, default=str))
+        else:
+            self._imprimir(informe)
+
+    def _auditar(self, explicar):
+        consultas = []
+        for url in _urls_a_auditar():
+            status, capturadas = _capturar_consultas(url)
+            for sql, params in capturadas:
+                consulta = {'vista': url, 'status': status, 'sql': sql}
+                if explicar is not None:
+                    inicio = time.perf_counter()
+                    consulta.update(explicar(sql, params))
+                    consulta.setdefault('tiempo_ms', round((time.perf_counter() - inicio) * 1000, 2))
+                else:
+                    consulta.update(escaneos_secuenciales=[], ordenamientos=[], indices_usados=[])
+                consultas.append(consulta)
+
+        indices = _indices()
+        usados = {nombre for c in consultas for nombre in c['indices_usados']}
+        return {
+            'motor': connection.vendor,
+            'fecha': timezone.now().isoformat(),
+            'planes_disponibles': explicar is not None,
+            'consultas': consultas,
+            'resumen': {
+                'consultas': len(consultas),
+                'escaneos_secuenciales': sum(len(c['escaneos_secuenciales']) for c in consultas),
+                'ordenamientos': sum(len(c['ordenamientos']) for c in consultas),
+                'ordenamientos_en_disco': sum(1 for c in consultas for o in c['ordenamientos'] if o['en_disco']),
+            },
+            'indices_duplicados': _indices_duplicados(indices),
+            'indices_no_usados': _indices_no_usados(indices, usados) if explicar else [],
+            'indices_sugeridos': _indices_sugeridos(consultas, indices),
+        }
+
+    def _imprimir(self, informe):
+        if not informe['planes_disponibles']:
+            self.stdout.write(self.style.WARNING(
+                f"Sin soporte de EXPLAIN para '{informe['motor']}': solo se revisan índices duplicados."
+            ))
+        resumen = informe['resumen']
+        self.stdout.write(
+            f"{resumen['consultas']} consultas, {resumen['escaneos_secuenciales']} escaneos secuenciales, "
+            f"{resumen['ordenamientos']} ordenamientos ({resumen['ordenamientos_en_disco']} en disco)"
+        )
+        for consulta in informe['consultas']:
+            if consulta['escaneos_secuenciales'] or consulta['ordenamientos']:
+                self.stdout.write(
+                    f"  {consulta['vista']}: escaneos={consulta['escaneos_secuenciales']} "
+                    f"ordenamientos={len(consulta['ordenamientos'])}"
+                )
+        for titulo, clave in (
+            ("Índices duplicados", 'indices_duplicados'),
+            ("Índices sin uso", 'indices_no_usados'),
+            ("Índices sugeridos", 'indices_sugeridos'),
+        ):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{titulo}:"))
+            for elemento in informe[clave] or [{'-': 'ninguno'}]:
+                self.stdout.write(f"  {elemento}")
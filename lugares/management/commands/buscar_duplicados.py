@@ -0,0 +1,83 @@
+import json
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from lugares import duplicados
+from lugares.models import Lugar
+
+# Lugares de la corrida, copiados una vez en cada proceso del pool.
+_lugares = None
+
+
+def _inicializar_proceso(lugares):
+    global _lugares
+    _lugares = lugares
+
+
+def _puntuar(argumentos):
+    pares, umbral = argumentos
+    return duplicados.puntuar_pares(_lugares, pares, umbral)
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca lugares duplicados (lugares/duplicados.py): agrupa por bloques para no "
+        "comparar todos contra todos y puntúa los pares candidatos en paralelo. "
+        "Para juntar un par, usar fusionar_lugares."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--umbral', type=float, default=duplicados.UMBRAL)
+        parser.add_argument('--lote', type=int, default=5000, help="Pares por tarea del pool.")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        lugares = list(Lugar.objects.order_by('pk').values(*duplicados.CAMPOS_COMPARACION))
+        pares = sorted(duplicados.pares_candidatos(lugares))
+        lotes = [
+            (pares[i:i + options['lote']], options['umbral'])
+            for i in range(0, len(pares), options['lote'])
+        ]
+
+        if options['procesos'] <= 1 or len(lotes) <= 1:
+            _inicializar_proceso(lugares)
+            resultados = [_puntuar(lote) for lote in lotes]
+        else:
+            # Las conexiones abiertas no se pueden compartir con los procesos hijos.
+            connections.close_all()
+            # 'fork' explícito: los hijos heredan Django ya configurado; con
+            # 'spawn' no podrían importar este módulo.
+            with multiprocessing.get_context('fork').Pool(
+                options['procesos'], initializer=_inicializar_proceso, initargs=(lugares,),
+            ) as pool:
+                resultados = pool.map(_puntuar, lotes)
+
+        nombres = {lugar['pk']: lugar['nombre'] for lugar in lugares}
+        encontrados = sorted((par for lote in resultados for par in lote), reverse=True)
+        duracion = time.perf_counter() - inicio
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'lugares': len(lugares),
+                'pares_comparados': len(pares),
+                'segundos': round(duracion, 2),
+                'duplicados': [
+                    {'puntaje': puntaje, 'a': a, 'nombre_a': nombres[a], 'b': b, 'nombre_b': nombres[b]}
+                    for puntaje, a, b in encontrados
+                ],
+            }, indent=2))
+            return
+
+        for puntaje, a, b in encontrados:
+            self.stdout.write(f"{puntaje:.2f}  #{a} {nombres[a]}  <->  #{b} {nombres[b]}")
+        todos = len(lugares) * (len(lugares) - 1) // 2
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(encontrados)} posibles duplicados entre {len(lugares)} lugares; "
+            f"{len(pares)} pares comparados de {todos} posibles, en {duracion:.1f}s"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from lugares import cambios
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacta el registro de cambios (lugares/cambios.py): deja solo el último "
+        "cambio de cada objeto. Conviene ejecutarlo periódicamente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Objetos por transacción de borrado.")
+
+    def handle(self, *args, **options):
+        # Numera lo que haya quedado sin secuencia (un proceso que murió tras el commit).
+        numerados = cambios.numerar_pendientes()
+        borrados = cambios.compactar(options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{numerados} cambios numerados, {borrados} cambios superados eliminados."
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lugares import duplicados
+from lugares.models import Lugar
+
+
+class Command(BaseCommand):
+    help = (
+        "Fusiona lugares duplicados en DESTINO: mueve sus reseñas, resúmenes archivados, "
+        "etiquetas y listas, y los borra (lugares/duplicados.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('destino', type=int, help="Id del lugar que se conserva.")
+        parser.add_argument('origenes', type=int, nargs='+', help="Ids de los duplicados.")
+
+    def handle(self, *args, **options):
+        try:
+            destino = Lugar.objects.get(pk=options['destino'])
+        except Lugar.DoesNotExist:
+            raise CommandError(f"No existe el lugar {options['destino']}.")
+
+        for pk in options['origenes']:
+            try:
+                origen = Lugar.objects.get(pk=pk)
+            except Lugar.DoesNotExist:
+                raise CommandError(f"No existe el lugar {pk}.")
+            movidas = duplicados.fusionar(destino, origen)
+            self.stdout.write(self.style.SUCCESS(
+                f"#{pk} {origen.nombre} fusionado en #{destino.pk} {destino.nombre} ({movidas} reseñas movidas)."
+            ))
@@ -0,0 +1,244 @@
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote, urlencode
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from lugares.models import Etiqueta, Lugar
+from lugares.views import LugarListView
+
+ARCHIVO_ESTADO = '.snapshot.json'
+URLS_POR_SITEMAP = 50000
+
+
+def _escribir_atomico(destino, datos):
+    """Escribe en un temporal del mismo directorio y lo renombra: nunca queda un archivo a medias."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def ruta_archivo(url):
+    """
+    Archivo estático para una URL. Las variantes con parámetros pasan a
+    directorios, por lo que el CDN debe reescribir:
+    /lista/?page=N -> /lista/pagina/N/ y /etiquetas/?etiqueta=X -> /etiquetas/X/.
+    """
+    ruta, _, consulta = url.partition('?')
+    ruta = ruta.strip('/')
+    if consulta.startswith('page='):
+        ruta = f"{ruta}/pagina/{consulta.split('=', 1)[1]}"
+    elif consulta.startswith('etiqueta='):
+        ruta = f"{ruta}/{consulta.split('=', 1)[1]}"
+    if ruta and any(parte in ('', '.', '..') for parte in ruta.split('/')):
+        raise ValueError(f"Ruta no válida: {url}")
+    return Path(ruta) / 'index.html'
+
+
+def ruta_segura(destino, url):
+    """
+    Ruta absoluta del archivo de `url` dentro de `destino`. Los nombres de
+    etiqueta los elige cualquier usuario: si la ruta tiene segmentos "." o ".."
+    o, resuelta, queda fuera de `destino`, lanza ValueError.
+    """
+    destino = Path(destino).resolve()
+    ruta = (destino / ruta_archivo(url)).resolve()
+    if ruta.parent == destino or not ruta.is_relative_to(destino):
+        raise ValueError(f"Ruta fuera del snapshot: {url}")
+    return ruta
+
+
+def _publicable(url):
+    try:
+        ruta_archivo(url)
+    except ValueError:
+        return False
+    return True
+
+
+def url_etiqueta(nombre):
+    # safe='': una "/" en el nombre no debe convertirse en un directorio más.
+    return f"{reverse('lista_etiquetas')}?etiqueta={quote(nombre, safe='')}"
+
+
+def _renderizar_lote(argumentos):
+    """Renderiza un lote de URLs como visitante anónimo y las escribe en `destino`."""
+    destino, urls = argumentos
+    resultado = {'escritas': 0, 'errores': []}
+    with override_settings(ALLOWED_HOSTS=['testserver'], CACHE_ANONIMA_VISTAS={}):
+        cliente = Client()
+        for url in urls:
+            try:
+                ruta = ruta_segura(destino, url)
+            except ValueError as error:
+                resultado['errores'].append((url, str(error)))
+                continue
+            respuesta = cliente.get(url)
+            if respuesta.status_code != 200:
+                resultado['errores'].append((url, f"HTTP {respuesta.status_code}"))
+                continue
+            _escribir_atomico(ruta, respuesta.content)
+            resultado['escritas'] += 1
+    connections.close_all()
+    return resultado
+
+
+def _escribir_sitemaps(destino, base_url, entradas):
+    """sitemap.xml (o un índice de sitemaps si hay más de 50.000 URLs)."""
+    def _urlset(parte):
+        filas = ''.join(
+            f'<url><loc>{escape(base_url + url)}</loc>'
+            + (f'<lastmod>{fecha.date().isoformat()}</lastmod>' if fecha else '')
+            + '</url>'
+            for url, fecha in parte
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{filas}</urlset>'
+        ).encode('utf-8')
+
+    partes = [entradas[i:i + URLS_POR_SITEMAP] for i in range(0, len(entradas), URLS_POR_SITEMAP)] or [[]]
+    if len(partes) == 1:
+        _escribir_atomico(destino / 'sitemap.xml', _urlset(partes[0]))
+        return
+    for n, parte in enumerate(partes, start=1):
+        _escribir_atomico(destino / f'sitemap-{n}.xml', _urlset(parte))
+    indice = ''.join(
+        f'<sitemap><loc>{escape(base_url)}/sitemap-{n}.xml</loc></sitemap>' for n in range(1, len(partes) + 1)
+    )
+    _escribir_atomico(destino / 'sitemap.xml', (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{indice}</sitemapindex>'
+    ).encode('utf-8'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera HTML estático de las páginas públicas (detalle y lista de lugares, "
+        "etiquetas y calificaciones) más un sitemap, para servirlas desde un CDN. "
+        "Solo vuelve a renderizar lo que cambió desde el snapshot anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--destino', default=os.path.join(settings.BASE_DIR, 'snapshot'),
+            help="Directorio de salida.",
+        )
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--lote', type=int, default=200, help="URLs por tarea del pool.")
+        parser.add_argument('--completo', action='store_true', help="Renderiza todo, no solo lo cambiado.")
+        parser.add_argument('--base-url', default='', help="Prefijo absoluto de las URLs del sitemap.")
+
+    def handle(self, *args, **options):
+        destino = Path(options['destino'])
+        destino.mkdir(parents=True, exist_ok=True)
+        inicio = time.perf_counter()
+        ahora = timezone.now()
+
+        estado = self._leer_estado(destino)
+        completo = options['completo'] or not estado
+        desde = None if completo else datetime.fromisoformat(estado['fecha'])
+
+        lugares = list(Lugar.objects.values_list('pk', 'actualizado_en').order_by())
+        pks = {pk for pk, _ in lugares}
+        if completo:
+            cambiados = pks
+        else:
+            cambiados = {pk for pk, actualizado in lugares if actualizado >= desde}
+        borrados = set(estado.get('lugares', [])) - pks if estado else set()
+
+        etiquetas = list(Etiqueta.objects.values_list('nombre', flat=True).order_by('nombre'))
+        etiquetas_borradas = set(estado.get('etiquetas', [])) - set(etiquetas)
+        hay_cambios = completo or cambiados or borrados or etiquetas != estado.get('etiquetas')
+
+        urls = [reverse('detalle_lugar', args=[pk]) for pk in sorted(cambiados)]
+        paginas = max(1, math.ceil(len(lugares) / LugarListView.paginate_by))
+        if hay_cambios:
+            # Listados: dependen de todos los lugares, se regeneran si algo cambió.
+            lista = reverse('lista_lugares')
+            urls.append(lista)
+            urls += [f'{lista}?{urlencode({"page": n})}' for n in range(2, paginas + 1)]
+            urls.append(reverse('calificaciones_sql'))
+            urls.append(reverse('lista_etiquetas'))
+            urls += [url_etiqueta(nombre) for nombre in etiquetas]
+
+        resultado = self._renderizar(destino, urls, options['procesos'], options['lote'])
+        self._borrar_obsoletos(destino, borrados, paginas, estado.get('paginas', 0), etiquetas_borradas)
+
+        lista = reverse('lista_lugares')
+        entradas = [(lista, None)]
+        entradas += [(f'{lista}?{urlencode({"page": n})}', None) for n in range(2, paginas + 1)]
+        entradas += [(reverse('calificaciones_sql'), None), (reverse('lista_etiquetas'), None)]
+        entradas += [(url, None) for url in map(url_etiqueta, etiquetas) if _publicable(url)]
+        entradas += [(reverse('detalle_lugar', args=[pk]), actualizado) for pk, actualizado in sorted(lugares)]
+        _escribir_sitemaps(destino, options['base_url'].rstrip('/'), entradas)
+
+        _escribir_atomico(destino / ARCHIVO_ESTADO, json.dumps({
+            'fecha': ahora.isoformat(),
+            'lugares': sorted(pks),
+            'paginas': paginas,
+            'etiquetas': etiquetas,
+        }).encode('utf-8'))
+
+        for url, error in resultado['errores']:
+            self.stderr.write(f"{url}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['escritas']} páginas escritas, {len(borrados)} lugares borrados, "
+            f"{len(resultado['errores'])} errores en {time.perf_counter() - inicio:.1f}s"
+        ))
+
+    def _leer_estado(self, destino):
+        try:
+            return json.loads((destino / ARCHIVO_ESTADO).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _renderizar(self, destino, urls, procesos, tamano_lote):
+        lotes = [(str(destino), urls[i:i + tamano_lote]) for i in range(0, len(urls), tamano_lote)]
+        if procesos <= 1 or len(lotes) <= 1:
+            resultados = [_renderizar_lote(lote) for lote in lotes]
+        else:
+            # Las conexiones abiertas no se pueden compartir con los procesos hijos.
+            connections.close_all()
+            # 'fork' explícito: los hijos heredan Django ya configurado. Con
+            # 'spawn' (el defecto en macOS y Windows) este módulo no se podría
+            # importar en el hijo antes de django.setup().
+            contexto = multiprocessing.get_context('fork')
+            with contexto.Pool(procesos) as pool:
+                resultados = list(pool.imap_unordered(_renderizar_lote, lotes))
+        return {
+            'escritas': sum(r['escritas'] for r in resultados),
+            'errores': [error for r in resultados for error in r['errores']],
+        }
+
+    def _borrar_obsoletos(self, destino, borrados, paginas, paginas_antes, etiquetas_borradas):
+        lista = reverse('lista_lugares')
+        urls = [url_etiqueta(nombre) for nombre in etiquetas_borradas]
+        urls += [reverse('detalle_lugar', args=[pk]) for pk in borrados]
+        urls += [f'{lista}?page={n}' for n in range(paginas + 1, paginas_antes + 1)]
+        for url in urls:
+            try:
+                ruta = ruta_segura(destino, url)
+            except ValueError:
+                continue
+            shutil.rmtree(ruta.parent, ignore_errors=True)
@@ -0,0 +1,136 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+# Se ejecuta en un intérprete nuevo para medir un arranque en frío real, igual
+# que el de un worker de gunicorn sin preload_app.
+SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+t1 = time.perf_counter()
+if sys.argv[2] == '1':
+    from lugares.arranque import precalentar
+    precalentar()
+t2 = time.perf_counter()
+
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+from django.test.utils import override_settings
+
+def pedir():
+    environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'testserver', 'wsgi.input': BytesIO()}
+    setup_testing_defaults(environ)
+    estado = []
+    cuerpo = b''.join(application(environ, lambda s, h, *a: estado.append(s)))
+    return estado[0], len(cuerpo)
+
+with override_settings(ALLOWED_HOSTS=['testserver'], CACHE_ANONIMA_VISTAS={}):
+    estado, _ = pedir()
+    t3 = time.perf_counter()
+    pedir()
+    t4 = time.perf_counter()
+print(json.dumps({
+    'estado': estado,
+    'importacion': t1 - t0,
+    'precalentamiento': t2 - t1,
+    'primera_respuesta': t3 - t2,
+    'segunda_respuesta': t4 - t3,
+}))
+"""
+
+
+def _medir_proceso(url, precalentar, importtime):
+    comando = [sys.executable]
+    if importtime:
+        comando += ['-X', 'importtime']
+    comando += ['-c', SCRIPT, url, '1' if precalentar else '0']
+    inicio = time.perf_counter()
+    proceso = subprocess.run(comando, capture_output=True, text=True, cwd=settings.BASE_DIR)
+    total = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise CommandError(proceso.stderr.strip().splitlines()[-1] if proceso.stderr else "Falló el proceso de medición.")
+    medicion = json.loads(proceso.stdout.strip().splitlines()[-1])
+    medicion['proceso_total'] = total
+    return medicion, proceso.stderr
+
+
+def _modulos_mas_lentos(salida_importtime, cantidad):
+    """Módulos de primer nivel ordenados por tiempo acumulado de importación."""
+    modulos = []
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        # Solo los paquetes importados directamente (sin sangría extra).
+        if nombre.startswith('  '):
+            continue
+        modulos.append((int(acumulado) / 1000, nombre.strip()))
+    return sorted(modulos, reverse=True)[:cantidad]
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque de un proceso de la aplicación: tiempo de importación "
+        "(django.setup y la aplicación WSGI), precalentamiento (lugares.arranque) "
+        "y tiempo hasta la primera respuesta, con y sin precalentar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Ruta a pedir (por defecto, la lista de lugares).")
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument(
+            '--importaciones', type=int, default=0, metavar='N',
+            help="Muestra los N módulos que más tardan en importarse (python -X importtime).",
+        )
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        url = options['url'] or reverse('lista_lugares')
+        resultados = []
+        for precalentar in (False, True):
+            mediciones = [
+                _medir_proceso(url, precalentar, importtime=False)[0]
+                for _ in range(options['repeticiones'])
+            ]
+            if any(m['estado'][:3] != '200' for m in mediciones):
+                raise CommandError(f"{url} respondió {mediciones[0]['estado']}.")
+            resultado = {'url': url, 'precalentado': precalentar, 'repeticiones': len(mediciones)}
+            for fase in ('importacion', 'precalentamiento', 'primera_respuesta', 'segunda_respuesta', 'proceso_total'):
+                resultado[f'{fase}_ms'] = _ms(statistics.median(m[fase] for m in mediciones))
+            resultados.append(resultado)
+
+        lentos = []
+        if options['importaciones']:
+            _, salida = _medir_proceso(url, True, importtime=True)
+            lentos = _modulos_mas_lentos(salida, options['importaciones'])
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'resultados': resultados,
+                'importaciones_ms': [{'modulo': nombre, 'ms': round(ms, 1)} for ms, nombre in lentos],
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'modo':<13} {'import':>8} {'precal.':>8} {'1ª resp':>8} {'2ª resp':>8} {'total':>8}  (mediana en ms)"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{'precalentado' if r['precalentado'] else 'en frío':<13} {r['importacion_ms']:>8} "
+                f"{r['precalentamiento_ms']:>8} {r['primera_respuesta_ms']:>8} "
+                f"{r['segunda_respuesta_ms']:>8} {r['proceso_total_ms']:>8}"
+            )
+        for ms, nombre in lentos:
+            self.stdout.write(f"  {ms:>8.1f} ms  {nombre}")
@@ -0,0 +1,113 @@
+import json
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError, close_old_connections, connections
+from django.utils.module_loading import autodiscover_modules
+
+from lugares import cola
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas vueltas del bucle se recuperan tareas colgadas y se purgan las viejas.
+VUELTAS_MANTENIMIENTO = 300
+
+# Espera máxima (segundos) entre reintentos cuando la base de datos no responde.
+ESPERA_MAXIMA_ERROR = 60
+
+
+def _bucle(espera, una_vez):
+    """Bucle de un proceso worker: reclama y ejecuta tareas hasta recibir SIGTERM."""
+    detener = False
+
+    def _al_terminar(*_):
+        nonlocal detener
+        detener = True
+
+    signal.signal(signal.SIGTERM, _al_terminar)
+    signal.signal(signal.SIGINT, _al_terminar)
+
+    vueltas = 0
+    errores = 0
+    while not detener:
+        # Descarta las conexiones caídas o vencidas (CONN_MAX_AGE), como hace
+        # Django al empezar y terminar cada petición.
+        close_old_connections()
+        try:
+            if vueltas % VUELTAS_MANTENIMIENTO == 0:
+                cola.recuperar_colgadas()
+                cola.purgar()
+            vueltas += 1
+            tarea = cola.reclamar()
+            if tarea is not None:
+                cola.ejecutar(tarea)
+        except (OperationalError, InterfaceError):
+            # Base de datos caída o reiniciada: se reintenta con espera creciente
+            # en vez de terminar el proceso (y dejar la cola detenida).
+            errores += 1
+            pausa = min(espera * 2 ** errores, ESPERA_MAXIMA_ERROR)
+            logger.exception("Error de base de datos en el worker; reintento en %.0f s", pausa)
+            connections.close_all()
+            time.sleep(pausa)
+            continue
+        errores = 0
+        if tarea is not None:
+            continue
+        if una_vez:
+            break
+        time.sleep(espera)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Ejecuta las tareas en segundo plano encoladas en la base de datos (lugares.cola)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=1, help="Número de procesos worker.")
+        parser.add_argument(
+            '--espera', type=float, default=1.0,
+            help="Segundos de espera cuando la cola está vacía.",
+        )
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help="Procesa las tareas listas y termina cuando la cola queda vacía.",
+        )
+        parser.add_argument(
+            '--estado', action='store_true',
+            help="Muestra la profundidad de la cola y las latencias en JSON y termina.",
+        )
+
+    def handle(self, *args, **options):
+        if options['estado']:
+            self.stdout.write(json.dumps(cola.estadisticas(), indent=2))
+            return
+
+        autodiscover_modules('tareas')
+
+        if options['procesos'] <= 1:
+            _bucle(options['espera'], options['una_vez'])
+            return
+
+        # Las conexiones abiertas no se pueden compartir entre procesos.
+        connections.close_all()
+        # 'fork' explícito: los hijos heredan Django configurado y las tareas
+        # registradas por autodiscover_modules; con 'spawn' no tendrían ninguna.
+        contexto = multiprocessing.get_context('fork')
+        procesos = [
+            contexto.Process(target=_bucle, args=(options['espera'], options['una_vez']))
+            for _ in range(options['procesos'])
+        ]
+        for proceso in procesos:
+            proceso.start()
+
+        def _reenviar(*_):
+            for proceso in procesos:
+                proceso.terminate()
+
+        signal.signal(signal.SIGTERM, _reenviar)
+        signal.signal(signal.SIGINT, _reenviar)
+        for proceso in procesos:
+            proceso.join()
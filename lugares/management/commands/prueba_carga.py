@@ -0,0 +1,113 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def _percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def _pedir(url, timeout, cabeceras):
+    inicio = time.perf_counter()
+    acierto = False
+    try:
+        peticion = urllib.request.Request(url, headers=cabeceras)
+        with urllib.request.urlopen(peticion, timeout=timeout) as respuesta:
+            respuesta.read()
+            ok = 200 <= respuesta.status < 400
+            acierto = respuesta.headers.get('X-Cache') == 'HIT'
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - inicio, ok, acierto
+
+
+def medir(url, peticiones, concurrencia, timeout=30, cache=True):
+    """
+    Lanza `peticiones` GET contra `url` con `concurrencia` clientes simultáneos.
+    Con cache=False cada petición lleva una cookie de sesión, así que la caché
+    de páginas anónimas (lugares/middleware.py) no responde y se mide la vista.
+    """
+    cabeceras = {} if cache else {'Cookie': f'{settings.SESSION_COOKIE_NAME}=prueba-carga'}
+    if cache:
+        # Primera petición fuera de la medición, para que la página ya esté en caché.
+        _pedir(url, timeout, cabeceras)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(lambda _: _pedir(url, timeout, cabeceras), range(peticiones)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(t for t, ok, _ in resultados if ok)
+    errores = sum(1 for _, ok, _ in resultados if not ok)
+    return {
+        'url': url,
+        'cache': cache,
+        'aciertos_cache': sum(1 for _, _, acierto in resultados if acierto),
+        'concurrencia': concurrencia,
+        'peticiones': peticiones,
+        'errores': errores,
+        'peticiones_por_segundo': round(len(latencias) / duracion, 1) if duracion else None,
+        'p50_ms': _ms(_percentil(latencias, 50)),
+        'p95_ms': _ms(_percentil(latencias, 95)),
+        'p99_ms': _ms(_percentil(latencias, 99)),
+        'max_ms': _ms(latencias[-1] if latencias else None),
+    }
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga HTTP simple. Se usa para comparar el despliegue WSGI "
+        "(Procfile 'web') con el ASGI (Procfile 'asgi') sobre las mismas URLs, "
+        "por ejemplo: prueba_carga http://127.0.0.1:8000/lista/ http://127.0.0.1:8001/lista/. "
+        "Por defecto mide cada URL con y sin la caché de páginas anónimas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help="URLs a medir (una por servidor a comparar).")
+        parser.add_argument('--peticiones', type=int, default=500)
+        parser.add_argument(
+            '--concurrencia', type=int, nargs='+', default=[1, 10, 50],
+            help="Niveles de concurrencia a probar.",
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--cache', choices=['con', 'sin', 'ambos'], default='ambos',
+            help="Medir con la caché de páginas, sin ella (cookie de sesión) o de ambas formas.",
+        )
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        modos = {'con': [True], 'sin': [False], 'ambos': [False, True]}[options['cache']]
+        resultados = [
+            medir(url, options['peticiones'], concurrencia, options['timeout'], cache)
+            for url in options['urls']
+            for cache in modos
+            for concurrencia in options['concurrencia']
+        ]
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'url':<45} {'cache':>5} {'hits':>5} {'conc':>5} {'req/s':>8} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['url']:<45} {'con' if r['cache'] else 'sin':>5} {r['aciertos_cache']:>5} "
+                f"{r['concurrencia']:>5} {r['peticiones_por_segundo'] or '-':>8} "
+                f"{r['p50_ms'] or '-':>8} {r['p95_ms'] or '-':>8} {r['p99_ms'] or '-':>8} {r['errores']:>5}"
+            )
@@ -0,0 +1,127 @@
+"""
+Caché de página completa para visitantes anónimos.
+
+CacheAnonimaMiddleware va antes de SessionMiddleware: si la petición es un GET
+sin cookie de sesión ni de mensajes y apunta a una de las vistas de
+CACHE_ANONIMA_VISTAS, se responde directamente desde la caché, sin tocar la
+sesión, el usuario ni la base de datos.
+
+Las claves incluyen una "generación" que cambia cada vez que se modifica un
+Lugar, una Reseña o una Etiqueta (ver lugares/signals.py), así que invalidar
+es escribir una sola clave. La generación vive en su propio alias
+(CACHE_ANONIMA_GENERACION_ALIAS), para que la limpieza de las páginas al
+llenarse no la borre. Ambos están en disco: los comparten los procesos de una
+misma máquina, pero con varias instancias (o el worker en otro contenedor)
+cada una tiene los suyos y puede servir páginas viejas hasta
+CACHE_ANONIMA_TIMEOUT segundos. Para invalidar en todas, esos alias deben
+apuntar a una caché común.
+"""
+import uuid
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+CLAVE_GENERACION = 'pagina-anonima:generacion'
+COOKIE_MENSAJES = 'messages'
+
+
+def _cache():
+    return caches[settings.CACHE_ANONIMA_ALIAS]
+
+
+def _generaciones():
+    # Alias propio: la limpieza por MAX_ENTRIES de las páginas no lo alcanza.
+    return caches[settings.CACHE_ANONIMA_GENERACION_ALIAS]
+
+
+def invalidar_cache_anonima():
+    """Descarta todas las páginas cacheadas cambiando la generación."""
+    _generaciones().set(CLAVE_GENERACION, uuid.uuid4().hex, None)
+
+
+class CacheAnonimaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.vistas = settings.CACHE_ANONIMA_VISTAS
+        self.timeout = settings.CACHE_ANONIMA_TIMEOUT
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # La caché es local (memoria/disco), así que en ambos caminos se
+        # consulta directamente sin pasar por un hilo.
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        clave = self._clave(request)
+        if clave is None:
+            return self.get_response(request)
+        guardada = _cache().get(clave)
+        if guardada is not None:
+            return self._respuesta(request, guardada)
+        response = self.get_response(request)
+        self._guardar(request, clave, response)
+        return response
+
+    async def __acall__(self, request):
+        clave = self._clave(request)
+        if clave is None:
+            return await self.get_response(request)
+        guardada = _cache().get(clave)
+        if guardada is not None:
+            return self._respuesta(request, guardada)
+        response = await self.get_response(request)
+        self._guardar(request, clave, response)
+        return response
+
+    def _clave(self, request):
+        """Clave de caché de la petición, o None si no se debe cachear."""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or COOKIE_MENSAJES in request.COOKIES:
+            return None
+        try:
+            nombre = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        if nombre not in self.vistas:
+            return None
+
+        generacion = _generaciones().get(CLAVE_GENERACION)
+        if generacion is None:
+            generacion = uuid.uuid4().hex
+            if not _generaciones().add(CLAVE_GENERACION, generacion, None):
+                generacion = _generaciones().get(CLAVE_GENERACION)
+        # Solo cuentan los parámetros relevantes para la vista, en orden fijo.
+        parametros = urlencode(sorted(
+            (p, request.GET[p]) for p in self.vistas[nombre] if p in request.GET
+        ))
+        return f'pagina-anonima:{generacion}:{request.path_info}?{parametros}'
+
+    def _guardar(self, request, clave, response):
+        if (
+            request.method != 'GET'
+            or response.status_code != 200
+            or response.streaming
+            or response.cookies
+            or 'private' in response.get('Cache-Control', '')
+        ):
+            return
+        guardada = (response.status_code, list(response.items()), response.content)
+        _cache().set(clave, guardada, self.timeout)
+        response['X-Cache'] = 'MISS'
+
+    def _respuesta(self, request, guardada):
+        status, cabeceras, contenido = guardada
+        # HEAD lleva las mismas cabeceras que GET (Content-Length incluido) pero sin cuerpo.
+        response = HttpResponse(b'' if request.method == 'HEAD' else contenido, status=status)
+        for nombre, valor in cabeceras:
+            response[nombre] = valor
+        response['X-Cache'] = 'HIT'
+        return response
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 11:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0003_remove_resena_catalogo_no_aplica_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lugar',
+            name='descripcion',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('clave', models.CharField(blank=True, help_text='Solo puede haber una tarea pendiente por clave', max_length=255, null=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=16)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('ejecutar_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_en', models.DateTimeField(blank=True, null=True)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tarea',
+                'verbose_name_plural': 'Tareas',
+                'ordering': ['ejecutar_desde'],
+                'indexes': [models.Index(fields=['estado', 'ejecutar_desde'], name='tarea_estado_ejecutar_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado', 'pendiente')), fields=('clave',), name='tarea_clave_pendiente_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-19 12:20
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, Max, Q
+
+TAMANO_LOTE = 500
+
+
+def colapsar_resenas_repetidas(apps, schema_editor):
+    """
+    Deja una sola reseña por (usuario, lugar): la más reciente. Se procesa en
+    lotes de pares repetidos, cada uno en su propia transacción, para no
+    bloquear la tabla entera en bases grandes.
+    """
+    Resena = apps.get_model('lugares', 'Resena')
+    db = schema_editor.connection.alias
+    while True:
+        repetidos = list(
+            Resena.objects.using(db)
+            .values('usuario_id', 'lugar_id')
+            .annotate(total=Count('id'), ultima=Max('id'))
+            .filter(total__gt=1)
+            .order_by()[:TAMANO_LOTE]
+        )
+        if not repetidos:
+            break
+        condicion = Q()
+        for par in repetidos:
+            condicion |= Q(usuario_id=par['usuario_id'], lugar_id=par['lugar_id'])
+        conservar = [par['ultima'] for par in repetidos]
+        with transaction.atomic(using=db):
+            Resena.objects.using(db).filter(condicion).exclude(pk__in=conservar).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('lugares', '0004_tarea'),
+    ]
+
+    operations = [
+        migrations.RunPython(colapsar_resenas_repetidas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resena',
+            constraint=models.UniqueConstraint(fields=('usuario', 'lugar'), name='resena_unica_usuario_lugar'),
+        ),
+    ]
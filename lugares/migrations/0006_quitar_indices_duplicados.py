@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-19 12:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0005_resena_unica_usuario_lugar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Primero el índice compuesto: en MySQL la FK lugar necesita algún índice.
+        migrations.AddIndex(
+            model_name='resena',
+            index=models.Index(fields=['lugar', '-creado_en'], name='resena_lugar_creado_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='lugar',
+            name='lugares_lug_tipo_30952c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lugar',
+            name='lugares_lug_comuna_ba4c3c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lugar',
+            name='lugares_lug_agregad_c4a40c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='resena',
+            name='lugares_res_lugar_i_dc2c53_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='resena',
+            name='lugares_res_usuario_fbe165_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='resena',
+            name='lugares_res_creado__ec78f1_idx',
+        ),
+        migrations.AlterField(
+            model_name='resena',
+            name='lugar',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='resenas', to='lugares.lugar'),
+        ),
+        migrations.AlterField(
+            model_name='resena',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='resenas', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
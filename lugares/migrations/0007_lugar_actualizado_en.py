@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copiar_agregado_en(apps, schema_editor):
+    Lugar = apps.get_model('lugares', 'Lugar')
+    Lugar.objects.using(schema_editor.connection.alias).update(actualizado_en=F('agregado_en'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0006_quitar_indices_duplicados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lugar',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_agregado_en, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0007_lugar_actualizado_en'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResenaArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comentario', models.TextField(blank=True)),
+                ('ruido', models.SmallIntegerField(blank=True, null=True)),
+                ('concurrencia', models.SmallIntegerField(blank=True, null=True)),
+                ('infraestructura', models.SmallIntegerField(blank=True, null=True)),
+                ('catalogo', models.SmallIntegerField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField()),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('lugar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resenas_archivadas', to='lugares.lugar')),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='resenas_archivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reseña archivada',
+                'verbose_name_plural': 'Reseñas archivadas',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'lugar'), name='resena_archivada_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenResenas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primer día del mes de creación de las reseñas')),
+                ('resenas', models.IntegerField(default=0)),
+                ('ruido_1', models.IntegerField(default=0)),
+                ('ruido_2', models.IntegerField(default=0)),
+                ('ruido_3', models.IntegerField(default=0)),
+                ('ruido_4', models.IntegerField(default=0)),
+                ('ruido_5', models.IntegerField(default=0)),
+                ('ruido_na', models.IntegerField(default=0)),
+                ('concurrencia_1', models.IntegerField(default=0)),
+                ('concurrencia_2', models.IntegerField(default=0)),
+                ('concurrencia_3', models.IntegerField(default=0)),
+                ('concurrencia_4', models.IntegerField(default=0)),
+                ('concurrencia_5', models.IntegerField(default=0)),
+                ('concurrencia_na', models.IntegerField(default=0)),
+                ('infraestructura_1', models.IntegerField(default=0)),
+                ('infraestructura_2', models.IntegerField(default=0)),
+                ('infraestructura_3', models.IntegerField(default=0)),
+                ('infraestructura_4', models.IntegerField(default=0)),
+                ('infraestructura_5', models.IntegerField(default=0)),
+                ('infraestructura_na', models.IntegerField(default=0)),
+                ('catalogo_1', models.IntegerField(default=0)),
+                ('catalogo_2', models.IntegerField(default=0)),
+                ('catalogo_3', models.IntegerField(default=0)),
+                ('catalogo_4', models.IntegerField(default=0)),
+                ('catalogo_5', models.IntegerField(default=0)),
+                ('catalogo_na', models.IntegerField(default=0)),
+                ('lugar', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_resenas', to='lugares.lugar')),
+            ],
+            options={
+                'verbose_name': 'Resumen de reseñas',
+                'verbose_name_plural': 'Resúmenes de reseñas',
+                'indexes': [models.Index(fields=['lugar', 'periodo'], name='resumen_lugar_periodo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0008_resenas_archivadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('guardar', 'Guardar'), ('eliminar', 'Eliminar')], max_length=10)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Cambio',
+                'verbose_name_plural': 'Cambios',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['modelo', 'objeto_id'], name='cambio_modelo_objeto_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 6.0 on 2026-10-19 14:10
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Copia de lugares/normalizacion.py tal como estaba al crear esta migración:
+# si ese módulo cambia, esta migración debe seguir produciendo lo mismo.
+ABREVIATURAS = {
+    "av": "avenida",
+    "avda": "avenida",
+    "bib": "biblioteca",
+    "bibl": "biblioteca",
+    "bibliot": "biblioteca",
+    "ctro": "centro",
+    "dr": "doctor",
+    "fac": "facultad",
+    "gral": "general",
+    "mun": "municipal",
+    "muni": "municipal",
+    "n": "numero",
+    "nro": "numero",
+    "pje": "pasaje",
+    "pdte": "presidente",
+    "pob": "poblacion",
+    "sta": "santa",
+    "sto": "santo",
+    "stgo": "santiago",
+    "u": "universidad",
+    "univ": "universidad",
+}
+
+VACIAS = {"a", "al", "de", "del", "el", "en", "la", "las", "los", "y"}
+
+
+def _sin_tildes(texto):
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def normalizar(texto):
+    if not texto:
+        return ""
+    texto = _sin_tildes(texto.lower()).replace("°", " ").replace("º", " ")
+    palabras = re.findall(r"[a-z0-9]+", texto)
+    return " ".join(ABREVIATURAS.get(p, p) for p in palabras)
+
+
+def _fonetica(palabra):
+    if palabra.isdigit():
+        return palabra
+    p = palabra.replace("ll", "y").replace("qu", "k").replace("ch", "x")
+    p = re.sub(r"c([ei])", r"s\1", p)
+    p = re.sub(r"g([ei])", r"j\1", p)
+    p = p.replace("gu", "g").replace("c", "k").replace("z", "s").replace("v", "b").replace("w", "b").replace("h", "")
+    p = re.sub(r"(.)\1+", r"\1", p)
+    return p[:1] + re.sub(r"[aeiou]", "", p[1:])
+
+
+def clave_fonetica(nombre_normalizado):
+    palabras = [p for p in nombre_normalizado.split() if p not in VACIAS]
+    return " ".join(sorted({_fonetica(p) for p in palabras}))[:255]
+
+
+def normalizar_lugares(apps, schema_editor):
+    Lugar = apps.get_model('lugares', 'Lugar')
+    lugares = Lugar.objects.using(schema_editor.connection.alias).only('nombre', 'comuna').order_by('pk')
+    lote = []
+    for lugar in lugares.iterator(chunk_size=500):
+        lugar.nombre_normalizado = normalizar(lugar.nombre)
+        lugar.comuna_normalizada = normalizar(lugar.comuna)
+        lugar.clave_fonetica = clave_fonetica(lugar.nombre_normalizado)
+        lote.append(lugar)
+        if len(lote) == 500:
+            Lugar.objects.using(schema_editor.connection.alias).bulk_update(
+                lote, ['nombre_normalizado', 'comuna_normalizada', 'clave_fonetica'],
+            )
+            lote = []
+    if lote:
+        Lugar.objects.using(schema_editor.connection.alias).bulk_update(
+            lote, ['nombre_normalizado', 'comuna_normalizada', 'clave_fonetica'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0009_cambio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lugar',
+            name='clave_fonetica',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='lugar',
+            name='comuna_normalizada',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='lugar',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(normalizar_lugares, migrations.RunPython.noop),
+    ]
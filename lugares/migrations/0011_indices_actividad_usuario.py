@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0010_lugar_normalizado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Primero los índices compuestos: en MySQL las FK necesitan algún índice.
+        migrations.AddIndex(
+            model_name='lista',
+            index=models.Index(fields=['usuario', '-creado_en', '-id'], name='lista_usuario_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lugar',
+            index=models.Index(fields=['agregado_por', '-agregado_en', '-id'], name='lugar_agregado_por_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resena',
+            index=models.Index(fields=['usuario', '-creado_en', '-id'], name='resena_usuario_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resenaarchivada',
+            index=models.Index(fields=['usuario', '-creado_en', '-id'], name='archivada_usuario_creado_idx'),
+        ),
+        migrations.AlterField(
+            model_name='lista',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='listas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='lugar',
+            name='agregado_por',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lugares_agregados', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
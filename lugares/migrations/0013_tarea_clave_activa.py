@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+def copiar_claves_pendientes(apps, schema_editor):
+    Tarea = apps.get_model('lugares', 'Tarea')
+    Tarea.objects.using(schema_editor.connection.alias).filter(
+        estado='pendiente', clave__isnull=False,
+    ).update(clave_activa=models.F('clave'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0012_envio_resena'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='clave_activa',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.RunPython(copiar_claves_pendientes, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='tarea',
+            name='tarea_clave_pendiente_unica',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+def numerar_existentes(apps, schema_editor):
+    # Los cambios ya registrados están confirmados: su secuencia es su id, así
+    # que los cursores que ya tienen los clientes siguen valiendo.
+    Cambio = apps.get_model('lugares', 'Cambio')
+    Cambio.objects.using(schema_editor.connection.alias).update(secuencia=models.F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0013_tarea_clave_activa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cambio',
+            name='secuencia',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(numerar_existentes, migrations.RunPython.noop),
+    ]
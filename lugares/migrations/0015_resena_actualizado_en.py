@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+def copiar_creacion(apps, schema_editor):
+    # Sin historial de ediciones: se toma la creación, como hasta ahora archivaba.
+    Resena = apps.get_model('lugares', 'Resena')
+    Resena.objects.using(schema_editor.connection.alias).update(actualizado_en=models.F('creado_en'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lugares', '0014_cambio_secuencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resena',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(copiar_creacion, migrations.RunPython.noop),
+    ]
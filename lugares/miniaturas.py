@@ -0,0 +1,248 @@
+"""
+Caché local de miniaturas para Lugar.imagen_url.
+
+Cada imagen externa se descarga una sola vez, en segundo plano, y se generan
+variantes de tamaño fijo en WebP y JPEG que quedan en disco (MINIATURAS_DIR).
+Por defecto las genera un hilo del propio proceso web, que es quien las sirve.
+Con MINIATURAS_EN_COLA las genera el worker de la cola (tarea
+'miniaturas.generar', ver lugares/tareas.py); eso solo sirve si
+MINIATURAS_DIR es un almacenamiento compartido entre web y worker.
+La caché tiene un tamaño máximo (MINIATURAS_MAX_BYTES) y, al superarlo, se
+borran primero los archivos usados hace más tiempo (LRU por mtime).
+
+La descarga se hace con la función indicada en MINIATURAS_DESCARGADOR, de modo
+que se puede reemplazar (por ejemplo, por un servidor HTTP local en pruebas).
+"""
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .cola import encolar
+
+logger = logging.getLogger(__name__)
+
+# Ancho máximo en píxeles de cada variante (se mantiene la proporción).
+TAMANOS = {
+    'pequena': 160,
+    'mediana': 480,
+    'grande': 960,
+}
+
+# Extensión en la URL -> formato de Pillow.
+FORMATOS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+# No se reintenta una descarga fallida antes de este tiempo (segundos).
+ESPERA_TRAS_ERROR = 3600
+
+# Un acceso solo actualiza el mtime (LRU) si el anterior es más antiguo que esto.
+INTERVALO_TOQUE = 3600
+
+_en_curso = set()
+_en_curso_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='miniaturas')
+
+
+def clave(url):
+    """Identificador estable de una URL de imagen (cambia si cambia la URL)."""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:20]
+
+
+def _directorio():
+    return Path(settings.MINIATURAS_DIR)
+
+
+def ruta(url, tamano, formato):
+    return _directorio() / clave(url) / f'{tamano}.{formato}'
+
+
+def _marca_error(url):
+    return _directorio() / clave(url) / '.error'
+
+
+def _validar_destino(url):
+    """
+    imagen_url la escribe cualquier usuario: solo se aceptan http(s) hacia
+    direcciones públicas, para que el servidor no sirva de puente hacia la
+    red interna (metadatos de la nube, servicios locales, etc.).
+    """
+    partes = urllib.parse.urlsplit(url)
+    if partes.scheme not in ('http', 'https') or not partes.hostname:
+        raise ValueError(f"URL no permitida: {url}")
+    puerto = partes.port or (443 if partes.scheme == 'https' else 80)
+    for *_, direccion in socket.getaddrinfo(partes.hostname, puerto, proto=socket.IPPROTO_TCP):
+        ip = ipaddress.ip_address(direccion[0].split('%', 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"La dirección de {partes.hostname} no es pública: {ip}")
+
+
+class _RedireccionValidada(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _validar_destino(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# Sin FileHandler ni FTPHandler: solo http(s), y cada redirección se valida.
+_abridor = urllib.request.OpenerDirector()
+for _handler in (
+    urllib.request.HTTPHandler, urllib.request.HTTPSHandler,
+    urllib.request.HTTPDefaultErrorHandler, urllib.request.HTTPErrorProcessor,
+    _RedireccionValidada,
+):
+    _abridor.add_handler(_handler())
+
+
+def descargar_http(url):
+    """
+    Descargador por defecto: GET con timeout y límite de tamaño, solo hacia
+    direcciones públicas.
+    """
+    limite = settings.MINIATURAS_MAX_DESCARGA
+    _validar_destino(url)
+    peticion = urllib.request.Request(url, headers={'User-Agent': 'lugares-estudio-miniaturas/1.0'})
+    with _abridor.open(peticion, timeout=10) as respuesta:
+        largo = respuesta.headers.get('Content-Length')
+        if largo and largo.isdigit() and int(largo) > limite:
+            raise ValueError(f"La imagen supera {limite} bytes: {url}")
+        datos = respuesta.read(limite + 1)
+    if len(datos) > limite:
+        raise ValueError(f"La imagen supera {limite} bytes: {url}")
+    return datos
+
+
+def _escribir_atomico(destino, datos):
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def generar(url):
+    """Descarga `url` y escribe todas las variantes. Devuelve True si tuvo éxito."""
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("Pillow no está instalado: no se generan miniaturas.")
+        return False
+
+    descargar = import_string(settings.MINIATURAS_DESCARGADOR)
+    try:
+        original = Image.open(io.BytesIO(descargar(url)))
+        original.load()
+    except Exception:
+        logger.exception("No se pudo obtener la imagen %s", url)
+        _escribir_atomico(_marca_error(url), b'')
+        return False
+
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+    for tamano, ancho in TAMANOS.items():
+        imagen = original.copy()
+        imagen.thumbnail((ancho, ancho * 4))
+        for formato, formato_pil in FORMATOS.items():
+            buffer = io.BytesIO()
+            imagen.save(buffer, formato_pil, quality=82, optimize=True)
+            _escribir_atomico(ruta(url, tamano, formato), buffer.getvalue())
+
+    desalojar()
+    return True
+
+
+def desalojar(max_bytes=None):
+    """Borra los archivos menos usados hasta dejar la caché bajo el límite."""
+    if max_bytes is None:
+        max_bytes = settings.MINIATURAS_MAX_BYTES
+    archivos = []
+    total = 0
+    for raiz, _, nombres in os.walk(_directorio()):
+        for nombre in nombres:
+            if nombre.startswith('.'):
+                continue
+            camino = os.path.join(raiz, nombre)
+            try:
+                st = os.stat(camino)
+            except FileNotFoundError:
+                continue
+            archivos.append((st.st_mtime, st.st_size, camino))
+            total += st.st_size
+    if total <= max_bytes:
+        return 0
+
+    borrados = 0
+    # Se deja un margen (90 %) para no desalojar en cada generación.
+    objetivo = max_bytes * 0.9
+    for _, tamano, camino in sorted(archivos):
+        if total <= objetivo:
+            break
+        try:
+            os.unlink(camino)
+        except FileNotFoundError:
+            continue
+        total -= tamano
+        borrados += 1
+    return borrados
+
+
+def _generar_en_segundo_plano(url):
+    try:
+        generar(url)
+    finally:
+        with _en_curso_lock:
+            _en_curso.discard(url)
+
+
+def solicitar(url):
+    """Pide generar las miniaturas de `url` si no está ya en curso."""
+    marca = _marca_error(url)
+    if marca.exists() and time.time() - marca.stat().st_mtime < ESPERA_TRAS_ERROR:
+        return
+    if settings.MINIATURAS_EN_COLA:
+        encolar('miniaturas.generar', {'url': url}, clave=f'miniaturas:{clave(url)}', max_intentos=1)
+        return
+    with _en_curso_lock:
+        if url in _en_curso:
+            return
+        _en_curso.add(url)
+    _executor.submit(_generar_en_segundo_plano, url)
+
+
+def obtener(url, tamano, formato):
+    """
+    Ruta de la variante pedida si ya está en caché; si no, pide generarla en
+    segundo plano y devuelve None.
+    """
+    camino = ruta(url, tamano, formato)
+    try:
+        mtime = camino.stat().st_mtime
+    except FileNotFoundError:
+        solicitar(url)
+        return None
+    ahora = time.time()
+    if ahora - mtime > INTERVALO_TOQUE:
+        os.utime(camino, (ahora, ahora))
+    return camino
@@ -1,8 +1,14 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.signals import post_save
 from django.conf import settings
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from . import normalizacion
+
 
 TIPO_LUGAR_CHOICES = [
     ("biblioteca", "Biblioteca"),
@@ -13,7 +19,18 @@ TIPO_LUGAR_CHOICES = [
 ]
 
 
-class Etiqueta(models.Model):
+class RegistraCambios:
+    """
+    Guarda dentro de una transacción, de modo que lo que escriben los
+    receptores de post_save (el registro de Cambio, ver signals.py) se confirma
+    o se descarta junto con la fila. delete() ya es atómico en Django.
+    """
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+
+class Etiqueta(RegistraCambios, models.Model):
     nombre = models.CharField(max_length=80, unique=True)
 
     class Meta:
@@ -25,7 +42,7 @@ class Etiqueta(models.Model):
         return self.nombre
 
 
-class Lugar(models.Model):
+class Lugar(RegistraCambios, models.Model):
     nombre = models.CharField(max_length=255)
     tipo = models.CharField(max_length=32, choices=TIPO_LUGAR_CHOICES, db_index=True)
     direccion = models.CharField(max_length=255, blank=True)
@@ -35,28 +52,45 @@ class Lugar(models.Model):
     horario_apertura = models.TimeField(null=True, blank=True)
     horario_cierre = models.TimeField(null=True, blank=True)
     wifi = models.BooleanField(default=False)
-    agregado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="lugares_agregados")
+    # Sin índice propio: lo cubre lugar_agregado_por_idx.
+    agregado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="lugares_agregados", db_index=False)
     agregado_en = models.DateTimeField(auto_now_add=True, db_index=True)
+    # También se actualiza al cambiar sus reseñas o etiquetas (ver signals.py).
+    actualizado_en = models.DateTimeField(auto_now=True, db_index=True)
 
     etiquetas = models.ManyToManyField(Etiqueta, blank=True, related_name="lugares")
 
+    # Derivados de nombre y comuna para detectar duplicados (ver lugares/duplicados.py).
+    nombre_normalizado = models.CharField(max_length=255, blank=True, editable=False)
+    comuna_normalizada = models.CharField(max_length=120, blank=True, editable=False, db_index=True)
+    clave_fonetica = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+
     class Meta:
         verbose_name = "Lugar"
         verbose_name_plural = "Lugares"
         ordering = ["-agregado_en", "nombre"]
         indexes = [
-            models.Index(fields=["tipo"]),
-            models.Index(fields=["comuna"]),
-            models.Index(fields=["agregado_en"]),
+            # Actividad de un usuario (perfil), de la más reciente a la más antigua.
+            models.Index(fields=["agregado_por", "-agregado_en", "-id"], name="lugar_agregado_por_idx"),
         ]
 
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        self.nombre_normalizado = normalizacion.normalizar(self.nombre)
+        self.comuna_normalizada = normalizacion.normalizar(self.comuna)
+        self.clave_fonetica = normalizacion.clave_fonetica(self.nombre_normalizado)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"nombre", "comuna"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "nombre_normalizado", "comuna_normalizada", "clave_fonetica"}
+        super().save(*args, **kwargs)
 
-class Resena(models.Model):
-    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="resenas")
-    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE, related_name="resenas")
+
+class Resena(RegistraCambios, models.Model):
+    # Sin índice propio: los cubren resena_unica_usuario_lugar y resena_lugar_creado_idx.
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="resenas", db_index=False)
+    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE, related_name="resenas", db_index=False)
     comentario = models.TextField(blank=True)
 
     ruido = models.SmallIntegerField(
@@ -85,25 +119,188 @@ class Resena(models.Model):
     )
 
     creado_en = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Última edición: el archivo mueve las reseñas por esta fecha, no por creado_en.
+    actualizado_en = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Reseña"
         verbose_name_plural = "Reseñas"
         ordering = ["-creado_en"]
         indexes = [
-            models.Index(fields=["lugar"]),
-            models.Index(fields=["usuario"]),
-            models.Index(fields=["creado_en"]),
+            # Reseñas de un lugar, de la más reciente a la más antigua.
+            models.Index(fields=["lugar", "-creado_en"], name="resena_lugar_creado_idx"),
+            # Reseñas de un usuario (perfil).
+            models.Index(fields=["usuario", "-creado_en", "-id"], name="resena_usuario_creado_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "lugar"], name="resena_unica_usuario_lugar"),
         ]
 
     def __str__(self):
         return f"Reseña de {self.usuario} sobre {self.lugar}"
 
 
+def guardar_resena(usuario, lugar_id, **valores):
+    """
+    Crea o actualiza la única reseña de `usuario` sobre el lugar con un solo
+    INSERT ... ON CONFLICT DO UPDATE (ON DUPLICATE KEY UPDATE en MySQL), así
+    que un doble envío no crea filas repetidas. Si el lugar no existe lanza
+    IntegrityError. Devuelve (resena, creada) con la fila tal como quedó.
+    """
+    nueva = Resena(usuario=usuario, lugar_id=lugar_id, **valores)
+    # MySQL no admite indicar la restricción en conflicto: usa la única que hay.
+    unique_fields = ["usuario", "lugar"] if connection.features.supports_update_conflicts_with_target else None
+    with transaction.atomic():
+        Resena.objects.bulk_create(
+            [nueva],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=[*valores, "actualizado_en"],
+        )
+        # El upsert deja la fila bloqueada hasta el final de la transacción, así
+        # que un envío simultáneo espera aquí. creado_en no se actualiza en el
+        # conflicto: si es el que puso este INSERT, la fila la creó esta llamada.
+        resena = Resena.objects.get(usuario=usuario, lugar_id=lugar_id)
+        creada = resena.creado_en == nueva.creado_en
+        if creada:
+            # La nueva reseña reemplaza a la archivada: se descuenta de los resúmenes.
+            for archivada in ResenaArchivada.objects.filter(usuario=usuario, lugar_id=lugar_id):
+                archivada.desarchivar()
+        # bulk_create no emite post_save; se emite aquí para que los receptores
+        # (invalidación de cachés, contadores, etc.) se enteren de la escritura.
+        post_save.send(
+            sender=Resena, instance=resena, created=creada,
+            update_fields=None, raw=False, using=Resena.objects.db,
+        )
+    return resena, creada
+
+
+class EnvioResena(models.Model):
+    """
+    Token de un formulario de reseña ya procesado, para descartar reenvíos
+    (doble clic, recarga) aunque lleguen a otro worker o a otra máquina.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    token = models.UUIDField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    # Tiempo durante el que se recuerda un token ya usado.
+    VIGENCIA = timedelta(hours=1)
+
+    class Meta:
+        verbose_name = "Envío de reseña"
+        verbose_name_plural = "Envíos de reseña"
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "token"], name="envio_resena_unico"),
+        ]
+
+    @classmethod
+    def registrar(cls, usuario, token):
+        """
+        Registra el token y devuelve True, o False si ya se había usado. Debe
+        llamarse en la transacción que guarda la reseña, para que se descarte
+        con ella si falla.
+        """
+        cls.objects.filter(usuario=usuario, creado_en__lt=timezone.now() - cls.VIGENCIA).delete()
+        try:
+            with transaction.atomic():
+                cls.objects.create(usuario=usuario, token=token)
+        except IntegrityError:
+            return False
+        return True
+
+
+# Dimensiones calificadas de 1 a 5 (o nulas, "no aplica") en Resena.
+CAMPOS_CALIFICACION = ("ruido", "concurrencia", "infraestructura", "catalogo")
+
+
+def clave_conteo(campo, valor):
+    """Nombre del contador de ResumenResenas para `valor` (1-5 o None) en `campo`."""
+    return f"{campo}_{'na' if valor is None else valor}"
+
+
+class ResenaArchivada(models.Model):
+    """
+    Reseña antigua sacada de Resena por el comando archivar_resenas. Sus
+    calificaciones ya están sumadas en ResumenResenas; esta tabla solo
+    conserva el texto y evita que cuente dos veces si el usuario vuelve a
+    opinar del lugar (ver guardar_resena).
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="resenas_archivadas", db_index=False)
+    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE, related_name="resenas_archivadas")
+    comentario = models.TextField(blank=True)
+    ruido = models.SmallIntegerField(null=True, blank=True)
+    concurrencia = models.SmallIntegerField(null=True, blank=True)
+    infraestructura = models.SmallIntegerField(null=True, blank=True)
+    catalogo = models.SmallIntegerField(null=True, blank=True)
+    creado_en = models.DateTimeField()
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Reseña archivada"
+        verbose_name_plural = "Reseñas archivadas"
+        indexes = [
+            models.Index(fields=["usuario", "-creado_en", "-id"], name="archivada_usuario_creado_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "lugar"], name="resena_archivada_unica"),
+        ]
+
+    def __str__(self):
+        return f"Reseña archivada de {self.usuario} sobre {self.lugar}"
+
+    def desarchivar(self):
+        """
+        Borra la reseña y resta su aporte con una fila de resumen negativa.
+        Primero se borra: si otra transacción ya la desarchivó no hay nada que
+        restar y devuelve False.
+        """
+        with transaction.atomic():
+            _, borradas = ResenaArchivada.objects.filter(pk=self.pk).delete()
+            if not borradas.get(self._meta.label):
+                return False
+            conteos = {clave_conteo(campo, getattr(self, campo)): -1 for campo in CAMPOS_CALIFICACION}
+            ResumenResenas.objects.create(
+                lugar_id=self.lugar_id,
+                periodo=timezone.localtime(self.creado_en).date().replace(day=1),
+                resenas=-1,
+                **conteos,
+            )
+        return True
+
+
+class ResumenResenas(models.Model):
+    """
+    Conteos de las reseñas archivadas de un lugar en un mes: cuántas hay y,
+    por dimensión, cuántas dieron cada valor o "no aplica". Las filas son
+    aditivas (no hay una única por lugar y mes): archivar un lote o
+    desarchivar una reseña solo inserta filas, y los agregados las suman.
+    """
+    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE, related_name="resumenes_resenas", db_index=False)
+    periodo = models.DateField(help_text="Primer día del mes de creación de las reseñas")
+    resenas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen de reseñas"
+        verbose_name_plural = "Resúmenes de reseñas"
+        indexes = [
+            models.Index(fields=["lugar", "periodo"], name="resumen_lugar_periodo_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.lugar} {self.periodo:%Y-%m}: {self.resenas} reseñas"
+
+
+# ruido_1 ... ruido_5, ruido_na, etc.: los mismos nombres que usa lugares.estadisticas.
+for _campo in CAMPOS_CALIFICACION:
+    for _valor in (1, 2, 3, 4, 5, None):
+        ResumenResenas.add_to_class(clave_conteo(_campo, _valor), models.IntegerField(default=0))
 
-class Lista(models.Model):
+
+class Lista(RegistraCambios, models.Model):
     nombre = models.CharField(max_length=200)
-    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="listas")
+    # Sin índice propio: lo cubre lista_usuario_creado_idx.
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="listas", db_index=False)
     lugares = models.ManyToManyField(Lugar, blank=True, related_name="listas")
     creado_en = models.DateTimeField(auto_now_add=True, db_index=True)
 
@@ -111,11 +308,88 @@ class Lista(models.Model):
         verbose_name = "Lista"
         verbose_name_plural = "Listas"
         ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["usuario", "-creado_en", "-id"], name="lista_usuario_creado_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nombre} — {self.usuario}"
 
 
+ESTADO_TAREA_CHOICES = [
+    ("pendiente", "Pendiente"),
+    ("en_curso", "En curso"),
+    ("completada", "Completada"),
+    ("fallida", "Fallida"),
+]
+
+
+class Tarea(models.Model):
+    """Trabajo en segundo plano de la cola en base de datos (ver lugares/cola.py)."""
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    clave = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Solo puede haber una tarea pendiente por clave"
+    )
+    # Copia de `clave` mientras la tarea está pendiente (NULL en otro estado).
+    # Un índice único normal sobre ella hace cumplir lo anterior en cualquier
+    # motor; MySQL ignora las restricciones únicas parciales.
+    clave_activa = models.CharField(max_length=255, null=True, blank=True, unique=True, editable=False)
+    estado = models.CharField(max_length=16, choices=ESTADO_TAREA_CHOICES, default="pendiente")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    ultimo_error = models.TextField(blank=True)
+
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    creada_en = models.DateTimeField(auto_now_add=True)
+    iniciada_en = models.DateTimeField(null=True, blank=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        ordering = ["ejecutar_desde"]
+        indexes = [
+            models.Index(fields=["estado", "ejecutar_desde"], name="tarea_estado_ejecutar_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.estado})"
+
+
+OPERACION_CAMBIO_CHOICES = [
+    ("guardar", "Guardar"),
+    ("eliminar", "Eliminar"),
+]
+
+
+class Cambio(models.Model):
+    """
+    Registro de altas, modificaciones y bajas de lugares, reseñas y listas,
+    escrito en la misma transacción que el cambio (ver lugares/cambios.py).
+    La secuencia, asignada tras confirmarse, sirve de cursor para sincronizar.
+    """
+    modelo = models.CharField(max_length=20)
+    objeto_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=10, choices=OPERACION_CAMBIO_CHOICES)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    secuencia = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        verbose_name = "Cambio"
+        verbose_name_plural = "Cambios"
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["modelo", "objeto_id"], name="cambio_modelo_objeto_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.operacion} {self.modelo} {self.objeto_id}"
+
+
 # Señal o método auxiliar (opcional) para calcular promedios:
 # Puedes crear métodos en Lugar para devolver promedios calculados sobre sus reseñas,
 # usando aggregation (Avg) y filtrando catalogo IS NOT NULL si corresponde.
@@ -0,0 +1,71 @@
+"""
+Normalización de textos libres de Lugar (nombre, dirección, comuna) para
+comparar lugares: sin tildes ni mayúsculas, sin puntuación, con las
+abreviaturas expandidas, más una clave fonética del nombre. Funciones puras,
+sin acceso a la base de datos (las usan Lugar.save y lugares.duplicados).
+"""
+import re
+import unicodedata
+
+ABREVIATURAS = {
+    "av": "avenida",
+    "avda": "avenida",
+    "bib": "biblioteca",
+    "bibl": "biblioteca",
+    "bibliot": "biblioteca",
+    "ctro": "centro",
+    "dr": "doctor",
+    "fac": "facultad",
+    "gral": "general",
+    "mun": "municipal",
+    "muni": "municipal",
+    "n": "numero",
+    "nro": "numero",
+    "pje": "pasaje",
+    "pdte": "presidente",
+    "pob": "poblacion",
+    "sta": "santa",
+    "sto": "santo",
+    "stgo": "santiago",
+    "u": "universidad",
+    "univ": "universidad",
+}
+
+# Palabras que no distinguen un lugar de otro.
+VACIAS = {"a", "al", "de", "del", "el", "en", "la", "las", "los", "y"}
+
+
+def _sin_tildes(texto):
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def normalizar(texto):
+    """'Bibl. Pública N°5, Stgo.' -> 'biblioteca publica numero 5 santiago'."""
+    if not texto:
+        return ""
+    texto = _sin_tildes(texto.lower()).replace("°", " ").replace("º", " ")
+    palabras = re.findall(r"[a-z0-9]+", texto)
+    return " ".join(ABREVIATURAS.get(p, p) for p in palabras)
+
+
+def palabras_significativas(texto_normalizado):
+    return [p for p in texto_normalizado.split() if p not in VACIAS]
+
+
+def _fonetica(palabra):
+    """Código aproximado de cómo suena una palabra en español."""
+    if palabra.isdigit():
+        return palabra
+    p = palabra.replace("ll", "y").replace("qu", "k").replace("ch", "x")
+    p = re.sub(r"c([ei])", r"s\1", p)
+    p = re.sub(r"g([ei])", r"j\1", p)
+    p = p.replace("gu", "g").replace("c", "k").replace("z", "s").replace("v", "b").replace("w", "b").replace("h", "")
+    p = re.sub(r"(.)\1+", r"\1", p)
+    # Las vocales (salvo la inicial) son las que más varían al escribir mal.
+    return p[:1] + re.sub(r"[aeiou]", "", p[1:])
+
+
+def clave_fonetica(nombre_normalizado):
+    """Clave de bloqueo: independiente del orden de las palabras y de errores de ortografía comunes."""
+    return " ".join(sorted({_fonetica(p) for p in palabras_significativas(nombre_normalizado)}))[:255]
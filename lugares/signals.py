@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cambios, estadisticas
+from .middleware import invalidar_cache_anonima
+from .models import Etiqueta, Lista, Lugar, Resena
+
+
+@receiver([post_save, post_delete], sender=Lugar)
+@receiver([post_save, post_delete], sender=Resena)
+@receiver([post_save, post_delete], sender=Etiqueta)
+@receiver(m2m_changed, sender=Lugar.etiquetas.through)
+def invalidar_paginas_anonimas(sender, **kwargs):
+    # Tras el commit, para que ninguna petición concurrente vuelva a cachear
+    # el estado anterior con la generación nueva.
+    transaction.on_commit(invalidar_cache_anonima)
+
+
+@receiver([post_save, post_delete], sender=Resena)
+def invalidar_distribucion(sender, instance, **kwargs):
+    lugar_id = instance.lugar_id
+    transaction.on_commit(lambda: estadisticas.invalidar(lugar_id))
+
+
+@receiver([post_save, post_delete], sender=Resena)
+def tocar_lugar_por_resena(sender, instance, **kwargs):
+    # La página del lugar muestra sus reseñas: cuenta como modificación del lugar.
+    Lugar.objects.filter(pk=instance.lugar_id).update(actualizado_en=timezone.now())
+
+
+@receiver(m2m_changed, sender=Lugar.etiquetas.through)
+def tocar_lugar_por_etiquetas(sender, instance, action, reverse, pk_set, **kwargs):
+    ahora = timezone.now()
+    if not reverse:
+        if action.startswith('post_'):
+            Lugar.objects.filter(pk=instance.pk).update(actualizado_en=ahora)
+    # Cambios hechos desde la etiqueta (etiqueta.lugares.add(...), etc.).
+    elif action == 'pre_clear':
+        Lugar.objects.filter(etiquetas=instance).update(actualizado_en=ahora)
+    elif action in ('post_add', 'post_remove'):
+        Lugar.objects.filter(pk__in=pk_set).update(actualizado_en=ahora)
+
+
+@receiver(post_save, sender=Etiqueta)
+@receiver(pre_delete, sender=Etiqueta)
+def tocar_lugares_por_etiqueta(sender, instance, created=False, **kwargs):
+    if not created:
+        Lugar.objects.filter(etiquetas=instance).update(actualizado_en=timezone.now())
+
+
+# Registro de cambios (lugares/cambios.py). Corre dentro de la transacción del
+# cambio: save() es atómico (RegistraCambios), delete() y las operaciones m2m
+# también, y guardar_resena emite post_save dentro de su transacción.
+
+@receiver(post_save, sender=Lugar)
+@receiver(post_save, sender=Resena)
+@receiver(post_save, sender=Lista)
+def registrar_guardado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cambios.registrar(instance, "guardar")
+
+
+@receiver(post_delete, sender=Lugar)
+@receiver(post_delete, sender=Resena)
+@receiver(post_delete, sender=Lista)
+def registrar_eliminacion(sender, instance, **kwargs):
+    cambios.registrar(instance, "eliminar")
+
+
+@receiver(m2m_changed, sender=Lugar.etiquetas.through)
+def registrar_etiquetas_lugar(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            cambios.registrar(instance, "guardar")
+    elif action == 'pre_clear':
+        cambios.registrar_varios(Lugar, instance.lugares.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        cambios.registrar_varios(Lugar, pk_set)
+
+
+@receiver(m2m_changed, sender=Lista.lugares.through)
+def registrar_lugares_lista(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            cambios.registrar(instance, "guardar")
+    elif action == 'pre_clear':
+        cambios.registrar_varios(Lista, instance.listas.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        cambios.registrar_varios(Lista, pk_set)
+
+
+@receiver(post_save, sender=Etiqueta)
+@receiver(pre_delete, sender=Etiqueta)
+def registrar_lugares_por_etiqueta(sender, instance, created=False, **kwargs):
+    # Los lugares se entregan con los nombres de sus etiquetas.
+    if not created:
+        cambios.registrar_varios(Lugar, instance.lugares.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Lugar)
+def registrar_listas_por_lugar(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no emite m2m_changed.
+    cambios.registrar_varios(Lista, instance.listas.values_list('pk', flat=True))
@@ -0,0 +1,8 @@
+"""Tareas en segundo plano de la app lugares (ver lugares/cola.py)."""
+from . import miniaturas
+from .cola import tarea
+
+
+@tarea('miniaturas.generar')
+def generar_miniaturas(url):
+    miniaturas.generar(url)
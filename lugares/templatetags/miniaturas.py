@@ -0,0 +1,14 @@
+from django import template
+from django.urls import reverse
+
+from lugares import miniaturas
+
+register = template.Library()
+
+
+@register.simple_tag
+def url_miniatura(lugar, tamano='mediana', formato='webp'):
+    """URL de la miniatura cacheada de lugar.imagen_url."""
+    if not lugar.imagen_url:
+        return ''
+    return reverse('miniatura_lugar', args=[lugar.pk, miniaturas.clave(lugar.imagen_url), tamano, formato])
@@ -1,3 +1,266 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import archivo, cambios, cola, duplicados, miniaturas, normalizacion
+from .management.commands import procesar_tareas
+from .models import Cambio, EnvioResena, Lugar, Resena, ResenaArchivada, ResumenResenas, Tarea, guardar_resena
+
+
+def descargar_imagen_de_prueba(url):
+    """Descargador falso (MINIATURAS_DESCARGADOR): una imagen PNG de 800x600."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def descargar_con_error(url):
+    raise OSError("sin conexión")
+
+
+class WorkerTests(TestCase):
+    def test_sobrevive_a_errores_de_base_de_datos(self):
+        ejecutadas = []
+        cola.tarea('prueba.anotar')(lambda: ejecutadas.append(1))
+        cola.encolar('prueba.anotar')
+
+        reclamar = cola.reclamar
+        fallos = [OperationalError("server closed the connection")] * 2
+
+        def reclamar_con_fallos():
+            if fallos:
+                raise fallos.pop()
+            return reclamar()
+
+        with mock.patch.object(cola, 'reclamar', reclamar_con_fallos), \
+                mock.patch.object(procesar_tareas.time, 'sleep') as dormir, \
+                mock.patch('signal.signal'):
+            procesar_tareas._bucle(1.0, una_vez=True)
+
+        self.assertEqual(ejecutadas, [1])
+        self.assertEqual(Tarea.objects.get().estado, cola.COMPLETADA)
+        # Espera creciente entre reintentos.
+        self.assertEqual([c.args[0] for c in dormir.call_args_list], [2.0, 4.0])
+
+
+@override_settings(MINIATURAS_DESCARGADOR='lugares.tests.descargar_imagen_de_prueba')
+class MiniaturasTests(SimpleTestCase):
+    url = 'https://ejemplo.cl/foto.png'
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        ajustes = override_settings(MINIATURAS_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def test_genera_todas_las_variantes(self):
+        self.assertTrue(miniaturas.generar(self.url))
+        for tamano, ancho in miniaturas.TAMANOS.items():
+            for formato in miniaturas.FORMATOS:
+                camino = miniaturas.obtener(self.url, tamano, formato)
+                self.assertIsNotNone(camino)
+                with Image.open(camino) as imagen:
+                    # Nunca se agranda: la grande (960) queda en 800x600.
+                    esperado = min(ancho, 800)
+                    self.assertEqual(imagen.size, (esperado, esperado * 600 // 800))
+
+    def test_sin_generar_pide_la_generacion(self):
+        with mock.patch.object(miniaturas, 'solicitar') as solicitar:
+            self.assertIsNone(miniaturas.obtener(self.url, 'pequena', 'webp'))
+        solicitar.assert_called_once_with(self.url)
+
+    @override_settings(MINIATURAS_DESCARGADOR='lugares.tests.descargar_con_error')
+    def test_descarga_fallida_no_se_reintenta_enseguida(self):
+        self.assertFalse(miniaturas.generar(self.url))
+        with mock.patch.object(miniaturas, '_executor') as executor:
+            miniaturas.solicitar(self.url)
+        executor.submit.assert_not_called()
+
+    def test_desaloja_primero_lo_menos_usado(self):
+        antigua, reciente = 'https://ejemplo.cl/a.png', 'https://ejemplo.cl/b.png'
+        miniaturas.generar(antigua)
+        miniaturas.generar(reciente)
+        hace_un_dia = time.time() - 86400
+        for raiz, _, nombres in os.walk(miniaturas._directorio() / miniaturas.clave(antigua)):
+            for nombre in nombres:
+                os.utime(os.path.join(raiz, nombre), (hace_un_dia, hace_un_dia))
+
+        tamano_reciente = sum(
+            f.stat().st_size for f in (miniaturas._directorio() / miniaturas.clave(reciente)).iterdir()
+        )
+        borrados = miniaturas.desalojar(max_bytes=tamano_reciente / 0.9)
+
+        self.assertEqual(borrados, len(miniaturas.TAMANOS) * len(miniaturas.FORMATOS))
+        self.assertFalse(miniaturas.ruta(antigua, 'grande', 'webp').exists())
+        self.assertTrue(miniaturas.ruta(reciente, 'grande', 'webp').exists())
+
+    def test_descargar_http_rechaza_destinos_no_publicos(self):
+        for url in [
+            'file:///etc/passwd',
+            'ftp://ejemplo.cl/foto.png',
+            'http://127.0.0.1/foto.png',
+            'http://localhost/foto.png',
+            'http://[::1]/foto.png',
+            'http://10.0.0.1/foto.png',
+            'http://192.168.1.10/foto.png',
+            'http://169.254.169.254/latest/meta-data/',
+        ]:
+            with self.subTest(url=url):
+                with self.assertRaises(ValueError):
+                    miniaturas.descargar_http(url)
+
+
+class GuardarResenaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', password='clave-de-prueba')
+        self.lugar = Lugar.objects.create(nombre='Biblioteca', comuna='Santiago', agregado_por=self.usuario)
+
+    def test_primer_envio_crea_la_resena(self):
+        resena, creada = guardar_resena(self.usuario, self.lugar.pk, comentario='Tranquila', ruido=2)
+        self.assertTrue(creada)
+        self.assertEqual(Resena.objects.get(), resena)
+        self.assertEqual(resena.comentario, 'Tranquila')
+
+    def test_segundo_envio_actualiza(self):
+        primera, _ = guardar_resena(self.usuario, self.lugar.pk, comentario='Tranquila', ruido=2)
+        segunda, creada = guardar_resena(self.usuario, self.lugar.pk, comentario='Ruidosa', ruido=5)
+        self.assertFalse(creada)
+        self.assertEqual(segunda.pk, primera.pk)
+        self.assertEqual(segunda.creado_en, primera.creado_en)
+        self.assertEqual(Resena.objects.get().ruido, 5)
+
+    def test_reenviar_el_mismo_token_no_aplica_dos_veces(self):
+        self.client.login(username='ana', password='clave-de-prueba')
+        url = reverse('crear_resena') + f'?lugar={self.lugar.pk}'
+        token = str(uuid.uuid4())
+        self.client.post(url, {'comentario': 'Primera', 'ruido': 2, 'token': token})
+        respuesta = self.client.post(url, {'comentario': 'Repetida', 'ruido': 4, 'token': token})
+
+        self.assertRedirects(respuesta, reverse('detalle_lugar', args=[self.lugar.pk]), fetch_redirect_response=False)
+        self.assertEqual(Resena.objects.get().comentario, 'Primera')
+        self.assertEqual(EnvioResena.objects.count(), 1)
+
+    def test_volver_a_resenar_desarchiva(self):
+        archivada = ResenaArchivada.objects.create(
+            usuario=self.usuario, lugar=self.lugar, comentario='Antigua', ruido=3,
+            creado_en=timezone.now() - timezone.timedelta(days=500),
+        )
+        resena, creada = guardar_resena(self.usuario, self.lugar.pk, comentario='Nueva', ruido=1)
+
+        self.assertTrue(creada)
+        self.assertFalse(ResenaArchivada.objects.filter(pk=archivada.pk).exists())
+        negativa = ResumenResenas.objects.get(lugar=self.lugar)
+        self.assertEqual(negativa.resenas, -1)
+        self.assertEqual(negativa.ruido_3, -1)
+        self.assertEqual(negativa.catalogo_na, -1)
+        # Desarchivar otra vez (otra transacción que llegó tarde) no resta de nuevo.
+        self.assertFalse(archivada.desarchivar())
+        self.assertEqual(ResumenResenas.objects.count(), 1)
+
+
+class CambiosTests(TransactionTestCase):
+    # Con commits reales: la numeración corre en transaction.on_commit.
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', password='clave-de-prueba')
+
+    def crear_lugar(self, nombre):
+        return Lugar.objects.create(nombre=nombre, comuna='Santiago', agregado_por=self.usuario)
+
+    def test_se_numera_al_confirmar(self):
+        with transaction.atomic():
+            self.crear_lugar('Biblioteca')
+            self.crear_lugar('Museo')
+            self.assertFalse(Cambio.objects.filter(secuencia__isnull=False).exists())
+        self.assertEqual(list(Cambio.objects.values_list('secuencia', flat=True)), [1, 2])
+
+    def test_cambio_confirmado_tarde_va_despues_del_cursor(self):
+        Cambio.objects.create(pk=10, modelo='lugar', objeto_id=1, operacion='guardar')
+        cambios.numerar_pendientes()
+        _, cursor, _ = cambios.pagina(0)
+        # Id menor, pero confirmado después de que el cliente leyó hasta `cursor`.
+        Cambio.objects.create(pk=5, modelo='lugar', objeto_id=2, operacion='guardar')
+        cambios.numerar_pendientes()
+
+        siguientes, _, _ = cambios.pagina(cursor)
+        self.assertEqual([c['id'] for c in siguientes], [2])
+
+    def test_pagina_por_cursor(self):
+        ids = [self.crear_lugar(f'Lugar {i}').pk for i in range(5)]
+        Lugar.objects.get(pk=ids[1]).delete()
+
+        vistos, cursor, hay_mas = [], 0, True
+        while hay_mas:
+            pagina, cursor, hay_mas = cambios.pagina(cursor, limite=2)
+            vistos.extend(pagina)
+        self.assertEqual([c['id'] for c in vistos], ids + [ids[1]])
+        self.assertEqual(vistos[0]['datos']['nombre'], 'Lugar 0')
+        self.assertIsNone(vistos[1]['datos'])
+        self.assertEqual(vistos[-1]['operacion'], 'eliminar')
+        self.assertEqual(cambios.pagina(cursor), ([], cursor, False))
+
+    def test_la_vista_no_numera(self):
+        Cambio.objects.create(modelo='lugar', objeto_id=1, operacion='guardar')
+        respuesta = self.client.get(reverse('cambios'))
+        self.assertEqual(respuesta.json()['cambios'], [])
+        self.assertTrue(Cambio.objects.filter(secuencia__isnull=True).exists())
+
+    def test_compactar_deja_el_ultimo_cambio(self):
+        lugar = self.crear_lugar('Biblioteca')
+        for nombre in ['Biblioteca Central', 'Biblioteca Nacional']:
+            lugar.nombre = nombre
+            lugar.save()
+        otro = self.crear_lugar('Museo')
+
+        self.assertEqual(cambios.compactar(), 2)
+        restantes, _, _ = cambios.pagina(0)
+        self.assertEqual([c['id'] for c in restantes], [lugar.pk, otro.pk])
+        self.assertEqual(restantes[0]['datos']['nombre'], 'Biblioteca Nacional')
+
+
+class ArchivoTests(TestCase):
+    def test_no_archiva_resenas_editadas_hace_poco(self):
+        usuario = User.objects.create_user('ana', password='clave-de-prueba')
+        lugares = [
+            Lugar.objects.create(nombre=nombre, comuna='Santiago', agregado_por=usuario)
+            for nombre in ['Biblioteca', 'Museo']
+        ]
+        for lugar in lugares:
+            guardar_resena(usuario, lugar.pk, comentario='Antigua', ruido=3)
+        hace_dos_anos = timezone.now() - timezone.timedelta(days=730)
+        Resena.objects.update(creado_en=hace_dos_anos, actualizado_en=hace_dos_anos)
+
+        guardar_resena(usuario, lugares[0].pk, comentario='Editada ayer', ruido=4)
+
+        self.assertEqual(archivo.archivar(archivo.limite_activas(12)), 1)
+        self.assertEqual(Resena.objects.get().lugar, lugares[0])
+        self.assertEqual(ResenaArchivada.objects.get().lugar, lugares[1])
+
+
+class SimilaresTests(TestCase):
+    def setUp(self):
+        usuario = User.objects.create_user('ana', password='clave-de-prueba')
+        for nombre in ['Biblioteca Nacional', 'Café Literario Nacional', 'Museo de Bellas Artes']:
+            Lugar.objects.create(nombre=nombre, comuna='Santiago', agregado_por=usuario)
+
+    def test_encuentra_el_mismo_lugar(self):
+        encontrados = duplicados.similares('Bibl. Nacional', 'Santiago')
+        self.assertEqual([l['nombre'] for l in encontrados], ['Biblioteca Nacional'])
+
+    def test_nombre_sin_palabras_no_trae_toda_la_comuna(self):
+        for nombre in ['', '!!!', 'de la']:
+            with self.subTest(nombre=nombre):
+                self.assertEqual(duplicados.palabra_principal(normalizacion.normalizar(nombre)), '')
+                with self.assertNumQueries(0):
+                    self.assertEqual(duplicados.similares(nombre, 'Santiago', umbral=0), [])
@@ -1,37 +1,58 @@
+from django.conf import settings
 from django.urls import path
-from .views import *
+from . import views
+
+# Con VISTAS_ASYNC (activado por asgi.py) las vistas de lectura más visitadas
+# usan su versión async; con WSGI se mantienen las vistas basadas en clases.
+if settings.VISTAS_ASYNC:
+    vista_lista_lugares = views.lugar_lista_async
+    vista_detalle_lugar = views.lugar_detalle_async
+    vista_lista_resenas = views.resena_lista_async
+    vista_calificaciones = views.calificaciones_sql_async
+else:
+    vista_lista_lugares = views.LugarListView.as_view()
+    vista_detalle_lugar = views.LugarDetailView.as_view()
+    vista_lista_resenas = views.ResenaListView.as_view()
+    vista_calificaciones = views.calificaciones_sql_view
 
 urlpatterns = [
-    path('', index, name='index'),
+    path('', views.index, name='index'),
 
     # Lugares
-    path('lista/', LugarListView.as_view(), name='lista_lugares'),
-    path('crear/', LugarCreateView.as_view(), name='crear_lugar'),
-    path('<int:pk>/', LugarDetailView.as_view(), name='detalle_lugar'),
-    path('<int:pk>/editar/', LugarUpdateView.as_view(), name='editar_lugar'),
-    path('<int:pk>/eliminar/', LugarDeleteView.as_view(), name='eliminar_lugar'),
+    path('lista/', vista_lista_lugares, name='lista_lugares'),
+    path('crear/', views.LugarCreateView.as_view(), name='crear_lugar'),
+    path('<int:pk>/', vista_detalle_lugar, name='detalle_lugar'),
+    path('<int:pk>/editar/', views.LugarUpdateView.as_view(), name='editar_lugar'),
+    path('<int:pk>/eliminar/', views.LugarDeleteView.as_view(), name='eliminar_lugar'),
+    path('<int:pk>/miniatura/<slug:clave>/<slug:tamano>.<slug:formato>', views.miniatura_lugar, name='miniatura_lugar'),
 
     # Reseñas
-    path('resenas/', ResenaListView.as_view(), name='lista_resenas'),
-    path('resenas/crear/', ResenaCreateView.as_view(), name='crear_resena'),
-    path('resenas/<int:pk>/', ResenaDetailView.as_view(), name='detalle_resena'),
-    path('resenas/<int:pk>/editar/', ResenaUpdateView.as_view(), name='editar_resena'),
-    path('resenas/<int:pk>/eliminar/', ResenaDeleteView.as_view(), name='eliminar_resena'),
+    path('resenas/', vista_lista_resenas, name='lista_resenas'),
+    path('resenas/crear/', views.ResenaCreateView.as_view(), name='crear_resena'),
+    path('resenas/<int:pk>/', views.ResenaDetailView.as_view(), name='detalle_resena'),
+    path('resenas/<int:pk>/editar/', views.ResenaUpdateView.as_view(), name='editar_resena'),
+    path('resenas/<int:pk>/eliminar/', views.ResenaDeleteView.as_view(), name='eliminar_resena'),
     
 
     # Listas
-    path('listas/', ListaListView.as_view(), name='lista_listas'),
-    path('listas/crear/', ListaCreateView.as_view(), name='crear_lista'),
-    path('listas/<int:pk>/', ListaDetailView.as_view(), name='detalle_lista'),
-    path('listas/<int:pk>/editar/', ListaUpdateView.as_view(), name='editar_lista'),
-    path('listas/<int:pk>/eliminar/', ListaDeleteView.as_view(), name='eliminar_lista'),
+    path('listas/', views.ListaListView.as_view(), name='lista_listas'),
+    path('listas/crear/', views.ListaCreateView.as_view(), name='crear_lista'),
+    path('listas/<int:pk>/', views.ListaDetailView.as_view(), name='detalle_lista'),
+    path('listas/<int:pk>/editar/', views.ListaUpdateView.as_view(), name='editar_lista'),
+    path('listas/<int:pk>/eliminar/', views.ListaDeleteView.as_view(), name='eliminar_lista'),
 
     # Etiquetas
-    path('etiquetas/', EtiquetaListView.as_view(), name='lista_etiquetas'),
-    path('etiquetas/crear/', EtiquetaCreateView.as_view(), name='crear_etiqueta'),
-    path('etiquetas/<int:pk>/editar/', EtiquetaUpdateView.as_view(), name='editar_etiqueta'),
+    path('etiquetas/', views.EtiquetaListView.as_view(), name='lista_etiquetas'),
+    path('etiquetas/crear/', views.EtiquetaCreateView.as_view(), name='crear_etiqueta'),
+    path('etiquetas/<int:pk>/editar/', views.EtiquetaUpdateView.as_view(), name='editar_etiqueta'),
     
     #calificaciones 
-    path('calificaciones-sql/', calificaciones_sql_view, name='calificaciones_sql'),
+    path('calificaciones-sql/', vista_calificaciones, name='calificaciones_sql'),
+
+    # Cola de tareas
+    path('tareas/estado/', views.estado_tareas_view, name='estado_tareas'),
+
+    # Registro de cambios para sincronización
+    path('cambios/', views.cambios_view, name='cambios'),
 
 ]
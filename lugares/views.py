@@ -4,12 +4,14 @@ from django.views.generic import (
     ListView, CreateView, UpdateView, DeleteView, DetailView
 )
 from django.urls import reverse_lazy, reverse
-from .models import Lugar, Resena, Lista, Etiqueta
+from .models import Lugar, Resena, Lista, Etiqueta, EnvioResena, guardar_resena
 from .forms import LugarForm, ResenaForm, ListaForm, EtiquetaForm
+from . import cambios, cola, duplicados, estadisticas, miniaturas
 from django.contrib import messages
-from django.http import HttpResponseForbidden
-from django.db import connection
-from django.shortcuts import render
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, FileResponse, JsonResponse
+from django.db import connection, transaction, IntegrityError
+from django.core.paginator import Paginator, InvalidPage
+from asgiref.sync import sync_to_async
 
 
 
@@ -31,6 +33,43 @@ class LugarDetailView(DetailView):
     template_name = "lugares/detalle.html"
     context_object_name = "lugar"
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('agregado_por')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['etiquetas'] = list(self.object.etiquetas.all())
+        context['resenas'] = list(self.object.resenas.select_related('usuario'))
+        context['distribucion'] = estadisticas.distribucion(self.object.pk)
+        return context
+
+
+def miniatura_lugar(request, pk, clave, tamano, formato):
+    """
+    Sirve una miniatura de lugar.imagen_url desde la caché local. La clave de la
+    URL depende de imagen_url, así que la respuesta se puede cachear para siempre.
+    Si la miniatura aún no existe se genera en segundo plano y, mientras tanto,
+    se redirige a la imagen original.
+    """
+    if tamano not in miniaturas.TAMANOS or formato not in miniaturas.FORMATOS:
+        raise Http404("Variante de miniatura no válida.")
+    imagen_url = Lugar.objects.filter(pk=pk).values_list('imagen_url', flat=True).first()
+    if not imagen_url:
+        raise Http404("El lugar no tiene imagen.")
+    if clave != miniaturas.clave(imagen_url):
+        # La imagen del lugar cambió desde que se generó el enlace.
+        return redirect('miniatura_lugar', pk, miniaturas.clave(imagen_url), tamano, formato)
+
+    ruta = miniaturas.obtener(imagen_url, tamano, formato)
+    if ruta is None:
+        response = redirect(imagen_url)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    response = FileResponse(open(ruta, 'rb'), content_type=miniaturas.CONTENT_TYPES[formato])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 
 class LugarCreateView(LoginRequiredMixin, CreateView):
     model = Lugar
@@ -40,6 +79,15 @@ class LugarCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('lista_lugares')
 
     def form_valid(self, form):
+        # Si se parece a un lugar existente se pide confirmación antes de crearlo.
+        if not self.request.POST.get('confirmar_duplicado'):
+            similares = duplicados.similares(
+                form.cleaned_data['nombre'],
+                form.cleaned_data['comuna'],
+                form.cleaned_data.get('direccion', ''),
+            )
+            if similares:
+                return self.render_to_response(self.get_context_data(form=form, similares=similares))
         form.instance.agregado_por = self.request.user
         return super().form_valid(form)
 
@@ -76,9 +124,6 @@ class ResenaListView(ListView):
 
 
 
-from django.contrib import messages
-from django.urls import reverse, reverse_lazy
-
 class ResenaCreateView(LoginRequiredMixin, CreateView):
     model = Resena
     form_class = ResenaForm
@@ -115,36 +160,35 @@ class ResenaCreateView(LoginRequiredMixin, CreateView):
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
-        # asignar usuario
-        form.instance.usuario = self.request.user
-
-        # lugar puede venir como instancia (ModelChoiceField) o como pk (string)
-        lugar_val = form.cleaned_data.get('lugar') or self.request.GET.get('lugar')
-
-        # si es instancia de Lugar, usar directamente
-        if isinstance(lugar_val, Lugar):
-            form.instance.lugar = lugar_val
-        else:
-            # intentar convertir/obtener por pk
-            try:
-                lugar_obj = Lugar.objects.get(pk=int(lugar_val))
-                form.instance.lugar = lugar_obj
-            except (TypeError, ValueError, Lugar.DoesNotExist):
-                form.add_error('lugar', 'Lugar no válido.')
-                return self.form_invalid(form)
-
-        response = super().form_valid(form)
+        # El lugar llega en ?lugar=PK (ver dispatch). No se consulta aparte: si
+        # no existe, la clave foránea hace fallar el upsert.
         try:
-            form.save_m2m()
-        except Exception:
-            pass
+            lugar_id = int(self.request.GET.get('lugar'))
+        except (TypeError, ValueError):
+            form.add_error(None, 'Lugar no válido.')
+            return self.form_invalid(form)
 
-        messages.success(self.request, "Reseña guardada correctamente.")
-        return response
+        token = form.cleaned_data.get('token')
+        valores = {campo: form.cleaned_data.get(campo) for campo in ResenaForm.Meta.fields}
+        try:
+            with transaction.atomic():
+                if token and not EnvioResena.registrar(self.request.user, token):
+                    # Reenvío del mismo formulario (doble clic, recarga): ya se guardó.
+                    return redirect('detalle_lugar', lugar_id)
+                self.object, creada = guardar_resena(self.request.user, lugar_id, **valores)
+        except IntegrityError:
+            form.add_error(None, 'Lugar no válido.')
+            return self.form_invalid(form)
+
+        if creada:
+            messages.success(self.request, "Reseña guardada correctamente.")
+        else:
+            messages.success(self.request, "Ya tenías una reseña de este lugar: se actualizó.")
+        return redirect(self.get_success_url())
 
     def get_success_url(self):
-        if self.object and self.object.lugar:
-            return reverse('detalle_lugar', args=[self.object.lugar.pk])
+        if self.object and self.object.lugar_id:
+            return reverse('detalle_lugar', args=[self.object.lugar_id])
         return reverse_lazy('lista_resenas')
 
 
@@ -285,49 +329,212 @@ class EtiquetaUpdateView(LoginRequiredMixin, UpdateView):
 
 #SQL
 
-def calificaciones_sql_view(request):
-    query = """
-        SELECT 
+# Promedios por lugar sobre las reseñas activas (lugares_resena) más las
+# archivadas, que solo existen como conteos en lugares_resumenresenas.
+CALIFICACIONES_SQL = """
+    WITH activas AS (
+        SELECT
+            lugar_id,
+            SUM(ruido) AS suma_ruido, COUNT(ruido) AS n_ruido,
+            SUM(concurrencia) AS suma_concurrencia, COUNT(concurrencia) AS n_concurrencia,
+            SUM(infraestructura) AS suma_infraestructura, COUNT(infraestructura) AS n_infraestructura,
+            SUM(catalogo) AS suma_catalogo, COUNT(catalogo) AS n_catalogo
+        FROM lugares_resena
+        GROUP BY lugar_id
+    ),
+    archivadas AS (
+        SELECT
+            lugar_id,
+            SUM(ruido_1 + 2 * ruido_2 + 3 * ruido_3 + 4 * ruido_4 + 5 * ruido_5) AS suma_ruido,
+            SUM(ruido_1 + ruido_2 + ruido_3 + ruido_4 + ruido_5) AS n_ruido,
+            SUM(concurrencia_1 + 2 * concurrencia_2 + 3 * concurrencia_3 + 4 * concurrencia_4 + 5 * concurrencia_5) AS suma_concurrencia,
+            SUM(concurrencia_1 + concurrencia_2 + concurrencia_3 + concurrencia_4 + concurrencia_5) AS n_concurrencia,
+            SUM(infraestructura_1 + 2 * infraestructura_2 + 3 * infraestructura_3 + 4 * infraestructura_4 + 5 * infraestructura_5) AS suma_infraestructura,
+            SUM(infraestructura_1 + infraestructura_2 + infraestructura_3 + infraestructura_4 + infraestructura_5) AS n_infraestructura,
+            SUM(catalogo_1 + 2 * catalogo_2 + 3 * catalogo_3 + 4 * catalogo_4 + 5 * catalogo_5) AS suma_catalogo,
+            SUM(catalogo_1 + catalogo_2 + catalogo_3 + catalogo_4 + catalogo_5) AS n_catalogo
+        FROM lugares_resumenresenas
+        GROUP BY lugar_id
+    ),
+    promedios AS (
+        SELECT
             l.id,
             l.nombre,
-            AVG(r.ruido) AS promedio_ruido,
-            AVG(r.concurrencia) AS promedio_concurrencia,
-            AVG(r.infraestructura) AS promedio_infraestructura,
-            AVG(r.catalogo) AS promedio_catalogo,
-            (
-                (
-                    COALESCE(AVG(r.ruido),0) +
-                    COALESCE(AVG(r.concurrencia),0) +
-                    COALESCE(AVG(r.infraestructura),0) +
-                    COALESCE(AVG(r.catalogo),0)
-                ) / 
-                NULLIF(
-                    (CASE WHEN AVG(r.ruido) IS NOT NULL THEN 1 ELSE 0 END) +
-                    (CASE WHEN AVG(r.concurrencia) IS NOT NULL THEN 1 ELSE 0 END) +
-                    (CASE WHEN AVG(r.infraestructura) IS NOT NULL THEN 1 ELSE 0 END) +
-                    (CASE WHEN AVG(r.catalogo) IS NOT NULL THEN 1 ELSE 0 END),
-                    0
-                )
-            ) AS promedio_general
+            (COALESCE(a.suma_ruido, 0) + COALESCE(h.suma_ruido, 0)) * 1.0
+                / NULLIF(COALESCE(a.n_ruido, 0) + COALESCE(h.n_ruido, 0), 0) AS promedio_ruido,
+            (COALESCE(a.suma_concurrencia, 0) + COALESCE(h.suma_concurrencia, 0)) * 1.0
+                / NULLIF(COALESCE(a.n_concurrencia, 0) + COALESCE(h.n_concurrencia, 0), 0) AS promedio_concurrencia,
+            (COALESCE(a.suma_infraestructura, 0) + COALESCE(h.suma_infraestructura, 0)) * 1.0
+                / NULLIF(COALESCE(a.n_infraestructura, 0) + COALESCE(h.n_infraestructura, 0), 0) AS promedio_infraestructura,
+            (COALESCE(a.suma_catalogo, 0) + COALESCE(h.suma_catalogo, 0)) * 1.0
+                / NULLIF(COALESCE(a.n_catalogo, 0) + COALESCE(h.n_catalogo, 0), 0) AS promedio_catalogo
         FROM lugares_lugar l
-        LEFT JOIN lugares_resena r ON l.id = r.lugar_id
-        GROUP BY l.id, l.nombre
-        ORDER BY l.nombre;
-    """
+        LEFT JOIN activas a ON a.lugar_id = l.id
+        LEFT JOIN archivadas h ON h.lugar_id = l.id
+    )
+    SELECT 
+        id,
+        nombre,
+        promedio_ruido,
+        promedio_concurrencia,
+        promedio_infraestructura,
+        promedio_catalogo,
+        (
+            (
+                COALESCE(promedio_ruido,0) +
+                COALESCE(promedio_concurrencia,0) +
+                COALESCE(promedio_infraestructura,0) +
+                COALESCE(promedio_catalogo,0)
+            ) / 
+            NULLIF(
+                (CASE WHEN promedio_ruido IS NOT NULL THEN 1 ELSE 0 END) +
+                (CASE WHEN promedio_concurrencia IS NOT NULL THEN 1 ELSE 0 END) +
+                (CASE WHEN promedio_infraestructura IS NOT NULL THEN 1 ELSE 0 END) +
+                (CASE WHEN promedio_catalogo IS NOT NULL THEN 1 ELSE 0 END),
+                0
+            )
+        ) AS promedio_general
+    FROM promedios
+    ORDER BY nombre;
+"""
+
+
+def _fila_calificacion(fila):
+    return {
+        'id': fila[0],
+        'nombre': fila[1],
+        'promedio_ruido': fila[2],
+        'promedio_concurrencia': fila[3],
+        'promedio_infraestructura': fila[4],
+        'promedio_catalogo': fila[5],
+        'promedio_general': fila[6],
+    }
+
+
+def _agregar_distribuciones(lugares):
+    """Añade a cada fila sus dimensiones (promedio + distribución), con una sola consulta para todas."""
+    distribuciones = estadisticas.distribuciones(l['id'] for l in lugares)
+    for lugar in lugares:
+        lugar['dimensiones'] = [
+            dict(dim, promedio=lugar[f"promedio_{dim['campo']}"])
+            for dim in distribuciones[lugar['id']]
+        ]
+    return lugares
+
+
+def calificaciones_sql_view(request):
     with connection.cursor() as cursor:
-        cursor.execute(query)
+        cursor.execute(CALIFICACIONES_SQL)
         resultados = cursor.fetchall()
     
-    lugares = []
-    for fila in resultados:
-        lugares.append({
-            'id': fila[0],
-            'nombre': fila[1],
-            'promedio_ruido': fila[2],
-            'promedio_concurrencia': fila[3],
-            'promedio_infraestructura': fila[4],
-            'promedio_catalogo': fila[5],
-            'promedio_general': fila[6],
-        })
+    lugares = _agregar_distribuciones([_fila_calificacion(fila) for fila in resultados])
     
-    return render(request, 'lugares/calificaciones.html', {'lugares': lugares})
\ No newline at end of file
+    return render(request, 'lugares/calificaciones.html', {'lugares': lugares})
+
+
+def estado_tareas_view(request):
+    """Profundidad de la cola de tareas y latencias recientes (solo staff)."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Solo disponible para el staff.")
+    return JsonResponse(cola.estadisticas())
+
+
+CAMBIOS_LIMITE_MAXIMO = 1000
+
+
+def cambios_view(request):
+    """
+    Cambios posteriores a ?cursor= (por defecto, desde el principio). El
+    cliente vuelve a pedir con el `cursor` devuelto mientras `hay_mas`.
+    """
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limite = min(int(request.GET.get('limite', 100)), CAMBIOS_LIMITE_MAXIMO)
+    except ValueError:
+        return HttpResponseBadRequest("cursor y limite deben ser enteros.")
+    if cursor < 0 or limite < 1:
+        return HttpResponseBadRequest("cursor y limite deben ser positivos.")
+    lista, nuevo_cursor, hay_mas = cambios.pagina(cursor, limite)
+    return JsonResponse({'cambios': lista, 'cursor': nuevo_cursor, 'hay_mas': hay_mas})
+
+
+# Vistas asíncronas
+#
+# Versiones async de las vistas de lectura más visitadas, pensadas para
+# servirse por ASGI (ver asgi.py y la entrada "asgi" del Procfile). Las
+# consultas usan el ORM async; el render de la plantilla se hace en un hilo
+# porque los context processors (usuario, mensajes) acceden a la sesión de
+# forma síncrona. Con WSGI se siguen usando las vistas basadas en clases.
+
+async def _paginar(request, queryset, por_pagina):
+    """Equivalente async de la paginación de ListView (404 si la página no existe)."""
+    total = await queryset.acount()
+    paginator = Paginator(range(total), por_pagina)
+    try:
+        page = paginator.page(request.GET.get('page') or 1)
+    except InvalidPage:
+        raise Http404("Página no válida.")
+    inicio = (page.number - 1) * por_pagina
+    page.object_list = [obj async for obj in queryset[inicio:inicio + por_pagina]]
+    return {
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'object_list': page.object_list,
+    }
+
+
+async def _lista_async(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _render_async(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def lugar_lista_async(request):
+    context = await _paginar(request, Lugar.objects.all(), LugarListView.paginate_by)
+    context['lugares'] = context['object_list']
+    return await _render_async(request, LugarListView.template_name, context)
+
+
+async def lugar_detalle_async(request, pk):
+    # El ORM async ejecuta cada consulta en el mismo hilo (thread_sensitive),
+    # una tras otra: lanzarlas con asyncio.gather no las haría paralelas.
+    lugar = await Lugar.objects.select_related('agregado_por').filter(pk=pk).afirst()
+    if lugar is None:
+        raise Http404("No existe el lugar.")
+    etiquetas = await _lista_async(Etiqueta.objects.filter(lugares__pk=pk))
+    resenas = await _lista_async(Resena.objects.filter(lugar_id=pk).select_related('usuario'))
+    distribucion = await sync_to_async(estadisticas.distribucion)(pk)
+    context = {
+        'object': lugar,
+        'lugar': lugar,
+        'etiquetas': etiquetas,
+        'resenas': resenas,
+        'distribucion': distribucion,
+    }
+    return await _render_async(request, LugarDetailView.template_name, context)
+
+
+async def resena_lista_async(request):
+    qs = Resena.objects.select_related('usuario', 'lugar')
+    lugar_pk = request.GET.get('lugar')
+    if lugar_pk:
+        qs = qs.filter(lugar__pk=lugar_pk)
+    context = await _paginar(request, qs.order_by('-creado_en'), ResenaListView.paginate_by)
+    context['resenas'] = context['object_list']
+    return await _render_async(request, ResenaListView.template_name, context)
+
+
+async def calificaciones_sql_async(request):
+    filas = Lugar.objects.raw(CALIFICACIONES_SQL)
+    lugares = [
+        _fila_calificacion((
+            l.id, l.nombre, l.promedio_ruido, l.promedio_concurrencia,
+            l.promedio_infraestructura, l.promedio_catalogo, l.promedio_general,
+        ))
+        async for l in filas
+    ]
+    lugares = await sync_to_async(_agregar_distribuciones)(lugares)
+    return await _render_async(request, 'lugares/calificaciones.html', {'lugares': lugares})
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proyecto_lugares_estudio.settings')
+# Bajo ASGI se sirven las versiones async de las vistas de lectura.
+os.environ.setdefault('VISTAS_ASYNC', 'True')
+# settings.py desactiva las conexiones persistentes en este modo.
+os.environ['SERVIDOR_ASGI'] = 'True'
 
 application = get_asgi_application()
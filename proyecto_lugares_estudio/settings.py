@@ -29,6 +29,10 @@ DEBUG = os.environ.get('DEBUG') == 'True'
 
 ALLOWED_HOSTS = ['.onrender.com']
 
+# Vistas de lectura async (lugares.urls). asgi.py lo activa por defecto.
+VISTAS_ASYNC = os.environ.get('VISTAS_ASYNC') == 'True'
+SERVIDOR_ASGI = os.environ.get('SERVIDOR_ASGI') == 'True'
+
 
 # Application definition
 
@@ -38,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'usuarios',
     'lugares',
@@ -45,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'lugares.middleware.CacheAnonimaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,13 +66,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': False,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Cargador con caché explícito, también con DEBUG: cada plantilla se
+            # compila una vez por proceso (lugares.arranque las precompila).
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -78,11 +93,71 @@ WSGI_APPLICATION = 'proyecto_lugares_estudio.wsgi.application'
 
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL')
+        default=os.environ.get('DATABASE_URL'),
+        # Conexiones persistentes: la que abre cada worker al arrancar
+        # (lugares.arranque) se reutiliza en vez de cerrarse tras la primera petición.
+        # No bajo ASGI: cada petición async usa su propio hilo y las conexiones
+        # persistentes quedarían abiertas sin reutilizarse.
+        conn_max_age=(
+            0 if VISTAS_ASYNC or SERVIDOR_ASGI
+            else int(os.environ.get('CONN_MAX_AGE', '60'))
+        ),
+        conn_health_checks=True,
     )
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # En disco para que la compartan todos los workers de la máquina. Al pasar
+    # MAX_ENTRIES se borra al azar 1/CULL_FREQUENCY de los archivos: debe
+    # alcanzar para todas las páginas (un detalle por lugar más los listados).
+    'paginas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'paginas'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_PAGINAS_MAX_ENTRIES', '20000')),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # Generación de la caché de páginas, aparte para que la limpieza de
+    # 'paginas' nunca la borre (eso invalidaría todo el sitio).
+    'generaciones': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'generaciones'),
+    },
+    # Distribuciones de calificaciones (lugares/estadisticas.py). Las invalidan
+    # los workers, la cola y los comandos, así que no puede ser por proceso.
+    # Con varias máquinas debe apuntar a un servidor común (Redis, Memcached).
+    # Una entrada por lugar: MAX_ENTRIES debe superar el número de lugares.
+    'estadisticas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'estadisticas'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_ESTADISTICAS_MAX_ENTRIES', '20000')),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+ESTADISTICAS_CACHE_ALIAS = 'estadisticas'
+
+# Caché de página completa para anónimos (lugares/middleware.py):
+# nombre de la vista -> parámetros GET que forman parte de la clave.
+CACHE_ANONIMA_ALIAS = 'paginas'
+CACHE_ANONIMA_GENERACION_ALIAS = 'generaciones'
+CACHE_ANONIMA_TIMEOUT = 300
+CACHE_ANONIMA_VISTAS = {
+    'index': (),
+    'lista_lugares': ('page',),
+    'detalle_lugar': (),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -120,6 +195,36 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic (build.sh) genera nombres con hash y versiones .gz/.br de cada
+# archivo; WhiteNoise sirve la versión comprimida según Accept-Encoding y marca
+# los archivos con hash como inmutables (Cache-Control de 10 años).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Miniaturas de Lugar.imagen_url (lugares/miniaturas.py)
+MINIATURAS_DIR = os.environ.get('MINIATURAS_DIR', os.path.join(BASE_DIR, 'cache', 'miniaturas'))
+MINIATURAS_MAX_BYTES = int(os.environ.get('MINIATURAS_MAX_BYTES', 200 * 1024 * 1024))
+MINIATURAS_MAX_DESCARGA = 10 * 1024 * 1024
+MINIATURAS_DESCARGADOR = 'lugares.miniaturas.descargar_http'
+# Generarlas en el worker de la cola en vez de en el proceso web. Solo si
+# MINIATURAS_DIR es un disco compartido: si no, web nunca ve los archivos.
+MINIATURAS_EN_COLA = os.environ.get('MINIATURAS_EN_COLA') == 'True'
+
+# Cola de tareas en base de datos (lugares/cola.py)
+TAREAS_TIMEOUT = 600  # segundos antes de dar por caído a un worker
+TAREAS_ESPERA_BASE = 10  # primer reintento; se duplica en cada intento
+TAREAS_RETENCION_DIAS = 7
+
+# Meses de reseñas que quedan en la tabla activa; las anteriores se archivan
+# con `manage.py archivar_resenas` (lugares/archivo.py).
+RESENAS_MESES_ACTIVOS = 12
+
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'index'
 LOGIN_URL = 'login'
\ No newline at end of file
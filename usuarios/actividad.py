@@ -0,0 +1,83 @@
+"""
+Línea de tiempo de la actividad de un usuario: sus reseñas (activas y
+archivadas), los lugares que agregó y sus listas, mezcladas de la más reciente
+a la más antigua.
+
+Se pagina por cursor (keyset), no por número de página: cada fuente se lee con
+una consulta que parte del último elemento mostrado y recorre su índice
+(usuario, -fecha, -id), así que cada página cuesta lo mismo sin importar
+cuánta actividad tenga el usuario ni en qué página se esté.
+"""
+import heapq
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+from lugares.models import Lista, Lugar, Resena, ResenaArchivada
+
+# (tipo, modelo, campo de fecha, campo del usuario, relaciones a traer).
+# La posición en la lista desempata elementos con la misma fecha.
+FUENTES = [
+    ("resena", Resena, "creado_en", "usuario", ["lugar"]),
+    ("archivada", ResenaArchivada, "creado_en", "usuario", ["lugar"]),
+    ("lugar", Lugar, "agregado_en", "agregado_por", []),
+    ("lista", Lista, "creado_en", "usuario", []),
+]
+
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Microsegundos desde EPOCA hasta el 31-12-9999, la mayor fecha representable.
+MAX_MICROS = (datetime(9999, 12, 31, tzinfo=dt_timezone.utc) - EPOCA) // timedelta(microseconds=1)
+
+
+def _codificar(clave):
+    fecha, orden, pk = clave
+    return f"{(fecha - EPOCA) // timedelta(microseconds=1)}.{orden}.{pk}"
+
+
+def decodificar_cursor(cursor):
+    """'micros.orden.id' -> (fecha, orden, id). ValueError si no es válido."""
+    micros, orden, pk = (int(parte) for parte in cursor.split("."))
+    if not 0 <= orden < len(FUENTES) or not 0 <= micros <= MAX_MICROS:
+        raise ValueError(cursor)
+    try:
+        return EPOCA + timedelta(microseconds=micros), orden, pk
+    except (OverflowError, OSError) as error:
+        raise ValueError(cursor) from error
+
+
+def _despues_de(campo_fecha, orden, cursor):
+    """Condición para los elementos de la fuente `orden` que van después del cursor."""
+    fecha, orden_cursor, pk = cursor
+    if orden < orden_cursor:
+        return Q(**{f"{campo_fecha}__lte": fecha})
+    if orden > orden_cursor:
+        return Q(**{f"{campo_fecha}__lt": fecha})
+    return Q(**{f"{campo_fecha}__lt": fecha}) | Q(**{campo_fecha: fecha, "pk__lt": pk})
+
+
+def pagina(usuario, cursor=None, limite=20):
+    """
+    Hasta `limite` elementos anteriores a `cursor` (None: los más recientes).
+    Devuelve (elementos, siguiente_cursor o None). Una consulta por fuente.
+    """
+    listas = []
+    for orden, (tipo, modelo, campo_fecha, campo_usuario, relaciones) in enumerate(FUENTES):
+        queryset = modelo.objects.filter(**{campo_usuario: usuario})
+        if cursor is not None:
+            queryset = queryset.filter(_despues_de(campo_fecha, orden, cursor))
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
+        objetos = queryset.order_by(f"-{campo_fecha}", "-pk")[:limite + 1]
+        listas.append([
+            {
+                "tipo": tipo,
+                "objeto": objeto,
+                "fecha": getattr(objeto, campo_fecha),
+                "clave": (getattr(objeto, campo_fecha), orden, objeto.pk),
+            }
+            for objeto in objetos
+        ])
+
+    elementos = list(heapq.merge(*listas, key=lambda e: e["clave"], reverse=True))
+    siguiente = _codificar(elementos[limite - 1]["clave"]) if len(elementos) > limite else None
+    return elementos[:limite], siguiente
@@ -0,0 +1,43 @@
+"""
+Contadores de actividad por usuario (ContadoresUsuario).
+
+Cada alta o baja de una reseña, lugar o lista suma o resta 1 con un UPDATE
+atómico (F()), dentro de la misma transacción que la escritura. Si el usuario
+aún no tiene fila se cuenta todo una vez (recalcular), lo que también cubre a
+los usuarios anteriores a los contadores.
+"""
+from django.db.models import F
+
+from lugares.models import Lista, Lugar, Resena, ResenaArchivada
+
+from .models import ContadoresUsuario
+
+
+def recalcular(usuario_id):
+    totales = {
+        "resenas": (
+            Resena.objects.filter(usuario_id=usuario_id).count()
+            + ResenaArchivada.objects.filter(usuario_id=usuario_id).count()
+        ),
+        "lugares": Lugar.objects.filter(agregado_por_id=usuario_id).count(),
+        "listas": Lista.objects.filter(usuario_id=usuario_id).count(),
+    }
+    contadores, _ = ContadoresUsuario.objects.update_or_create(usuario_id=usuario_id, defaults=totales)
+    return contadores
+
+
+def sumar(usuario_id, campo, delta):
+    if usuario_id is None:
+        return
+    actualizados = ContadoresUsuario.objects.filter(usuario_id=usuario_id).update(**{campo: F(campo) + delta})
+    # Sin fila todavía: se cuenta todo (ya incluye la fila actual). En los
+    # borrados no, porque pueden venir del borrado en cascada del propio usuario.
+    if not actualizados and delta > 0:
+        recalcular(usuario_id)
+
+
+def obtener(usuario):
+    try:
+        return usuario.contadores
+    except ContadoresUsuario.DoesNotExist:
+        return recalcular(usuario.pk)
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadoresUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contadores', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('resenas', models.IntegerField(default=0)),
+                ('lugares', models.IntegerField(default=0)),
+                ('listas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contadores de usuario',
+                'verbose_name_plural': 'Contadores de usuarios',
+            },
+        ),
+    ]
@@ -1,3 +1,23 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ContadoresUsuario(models.Model):
+    """
+    Totales de actividad de un usuario, mantenidos por signals.py con sumas y
+    restas en cada escritura para no contar filas al mostrar el perfil.
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="contadores",
+    )
+    # Incluye las reseñas archivadas (lugares.ResenaArchivada).
+    resenas = models.IntegerField(default=0)
+    lugares = models.IntegerField(default=0)
+    listas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Contadores de usuario"
+        verbose_name_plural = "Contadores de usuarios"
+
+    def __str__(self):
+        return f"{self.usuario}: {self.resenas} reseñas, {self.lugares} lugares, {self.listas} listas"
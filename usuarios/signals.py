@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lugares.models import Lista, Lugar, Resena, ResenaArchivada
+
+from . import contadores
+
+# Campo del contador y atributo con el usuario de cada modelo.
+CONTADOS = {
+    Resena: ("resenas", "usuario_id"),
+    ResenaArchivada: ("resenas", "usuario_id"),
+    Lugar: ("lugares", "agregado_por_id"),
+    Lista: ("listas", "usuario_id"),
+}
+
+
+@receiver(post_save, sender=Resena)
+@receiver(post_save, sender=ResenaArchivada)
+@receiver(post_save, sender=Lugar)
+@receiver(post_save, sender=Lista)
+def sumar_creado(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        campo, atributo = CONTADOS[sender]
+        contadores.sumar(getattr(instance, atributo), campo, 1)
+
+
+@receiver(post_delete, sender=Resena)
+@receiver(post_delete, sender=ResenaArchivada)
+@receiver(post_delete, sender=Lugar)
+@receiver(post_delete, sender=Lista)
+def restar_borrado(sender, instance, **kwargs):
+    campo, atributo = CONTADOS[sender]
+    contadores.sumar(getattr(instance, atributo), campo, -1)
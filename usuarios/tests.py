@@ -1,3 +1,31 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from lugares.models import Lista, Lugar, Resena
+
+from . import actividad
+
+
+class CursorActividadTests(TestCase):
+    def test_cursor_valido_ida_y_vuelta(self):
+        usuario = User.objects.create_user('ana')
+        lugar = Lugar.objects.create(nombre='Biblioteca', comuna='Santiago', agregado_por=usuario)
+        Resena.objects.create(usuario=usuario, lugar=lugar, comentario='Tranquila')
+        Lista.objects.create(usuario=usuario, nombre='Favoritos')
+
+        elementos, siguiente = actividad.pagina(usuario, limite=1)
+        self.assertEqual(len(elementos), 1)
+        self.assertEqual(actividad.decodificar_cursor(siguiente), elementos[0]['clave'])
+
+    def test_cursores_no_validos(self):
+        for cursor in ['', 'abc', '1.2', '1.9.1', '-1.0.1', '9' * 40 + '.0.1']:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    actividad.decodificar_cursor(cursor)
+
+    def test_perfil_con_cursor_enorme_responde_400(self):
+        User.objects.create_user('ana')
+        url = reverse('perfil', args=['ana'])
+        respuesta = self.client.get(url, {'antes': '9' * 40 + '.0.1'})
+        self.assertEqual(respuesta.status_code, 400)
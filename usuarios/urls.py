@@ -6,4 +6,6 @@ urlpatterns = [
     path('registro/', views.registro, name='registro'),
     path('login/', LoginView.as_view(template_name='login.html'), name='login'),
     path('logout/', LogoutView.as_view(next_page='login'), name='logout'),
+    path('perfil/', views.mi_perfil, name='mi_perfil'),
+    path('usuarios/<str:username>/', views.perfil, name='perfil'),
 ]
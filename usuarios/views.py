@@ -1,5 +1,10 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
+from django.http import HttpResponseBadRequest
+
+from . import actividad, contadores
 
 def registro(request):
     if request.method == 'POST':
@@ -11,3 +16,26 @@ def registro(request):
         form = UserCreationForm()
     
     return render(request, 'registro.html', {'form': form})
+
+
+def perfil(request, username):
+    """Contadores y actividad del usuario, paginada con ?antes=<cursor>."""
+    usuario = get_object_or_404(get_user_model(), username=username)
+    cursor = request.GET.get('antes')
+    if cursor:
+        try:
+            cursor = actividad.decodificar_cursor(cursor)
+        except ValueError:
+            return HttpResponseBadRequest("Cursor no válido.")
+    elementos, siguiente = actividad.pagina(usuario, cursor or None)
+    return render(request, 'perfil.html', {
+        'perfil': usuario,
+        'contadores': contadores.obtener(usuario),
+        'elementos': elementos,
+        'siguiente': siguiente,
+    })
+
+
+@login_required
+def mi_perfil(request):
+    return redirect('perfil', username=request.user.username)